@@ -0,0 +1,288 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from config import Config
+
+
+class AdmissionRejected(Exception):
+    """Raised when the extraction pipeline is saturated"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ('user_id', 'enqueued_at', 'granted')
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class Reservation:
+    """Queue capacity reserved up front for one document's chunks.
+
+    Has the same slot() as AdmissionController, so it can be passed
+    wherever a controller is expected.
+    """
+
+    __slots__ = ('controller', 'user_id', 'remaining')
+
+    def __init__(self, controller: 'AdmissionController', user_id: str,
+                 chunks: int):
+        self.controller = controller
+        self.user_id = user_id
+        self.remaining = chunks
+
+    def slot(self, user_id: str):
+        return self.controller.slot(user_id, reservation=self)
+
+
+class AdmissionController:
+    """Bounded queue of pending LLM chunks with per-user fair scheduling.
+
+    Every chunk sent to the LLM must hold a slot. At most `max_active` slots
+    are handed out globally and at most `per_user_active` per user; waiting
+    chunks are granted round-robin across users so one large statement
+    cannot starve everybody else. When the queue is full, callers are
+    rejected immediately with a Retry-After hint instead of blocking.
+    """
+
+    def __init__(self, max_pending: int, max_active: int, per_user_active: int,
+                 per_user_pending: int, max_wait_seconds: float,
+                 default_retry_after: int):
+        self.max_pending = max_pending
+        self.max_active = max_active
+        self.per_user_active = per_user_active
+        self.per_user_pending = per_user_pending
+        self.max_wait_seconds = max_wait_seconds
+        self.default_retry_after = default_retry_after
+
+        self._cond = threading.Condition()
+        # user_id -> deque of waiting tickets, in round-robin order
+        self._waiting = OrderedDict()
+        self._active = {}
+        self._active_total = 0
+        self._pending_total = 0
+        # user_id -> reserved chunks not yet turned into tickets
+        self._reserved = {}
+
+        # Metrics
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._wait_times = deque(maxlen=1000)
+        self._service_times = deque(maxlen=1000)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def check_capacity(self, user_id: str):
+        """Fast-path check used before accepting new work from a user"""
+        with self._cond:
+            self._reject_if_saturated(user_id)
+
+    @contextmanager
+    def reserve(self, user_id: str, chunks: int):
+        """Reserve queue capacity for a document before parsing starts.
+
+        Raises AdmissionRejected at once when `chunks` more pending chunks
+        (capped at the per-user limit) do not fit. Chunks parsed through the
+        yielded Reservation are then never rejected or timed out: they use
+        the reserved capacity first and are queued past the limit if the
+        estimate was too low, so an accepted document cannot fail midway.
+        Unused capacity is returned when the block exits.
+        """
+        chunks = max(0, min(chunks, self.per_user_pending, self.max_pending))
+        with self._cond:
+            if chunks:
+                self._reject_if_saturated(user_id, chunks)
+                self._pending_total += chunks
+                self._reserved[user_id] = self._reserved.get(user_id, 0) + chunks
+        reservation = Reservation(self, user_id, chunks)
+        try:
+            yield reservation
+        finally:
+            with self._cond:
+                self._unreserve(user_id, reservation.remaining)
+                self._pending_total -= reservation.remaining
+                reservation.remaining = 0
+                self._dispatch()
+
+    @contextmanager
+    def slot(self, user_id: str, reservation: Reservation = None):
+        """Hold an LLM slot for the duration of the block"""
+        self.acquire(user_id, reservation)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    def acquire(self, user_id: str, reservation: Reservation = None):
+        """Wait for a fair share of LLM capacity or raise AdmissionRejected.
+
+        With a reservation the chunk was admitted up front, so it waits for
+        its turn without being rejected.
+        """
+        with self._cond:
+            if reservation is not None and reservation.remaining > 0:
+                # Turn one reserved chunk into a ticket
+                reservation.remaining -= 1
+                self._unreserve(user_id, 1)
+            else:
+                if reservation is None:
+                    self._reject_if_saturated(user_id)
+                self._pending_total += 1
+
+            ticket = _Ticket(user_id)
+            self._waiting.setdefault(user_id, deque()).append(ticket)
+            self._dispatch()
+
+            deadline = ticket.enqueued_at + self.max_wait_seconds
+            while not ticket.granted:
+                if reservation is not None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._drop_ticket(ticket)
+                    self._timed_out += 1
+                    raise AdmissionRejected(
+                        'Timed out waiting for extraction capacity',
+                        self._retry_after())
+                self._cond.wait(remaining)
+
+            self._admitted += 1
+            self._wait_times.append(time.monotonic() - ticket.enqueued_at)
+
+    def release(self, user_id: str, service_seconds: float = None):
+        """Return a slot obtained with acquire()"""
+        with self._cond:
+            self._active[user_id] -= 1
+            if self._active[user_id] <= 0:
+                del self._active[user_id]
+            self._active_total -= 1
+            self._pending_total -= 1
+            if service_seconds is not None:
+                self._service_times.append(service_seconds)
+            self._dispatch()
+
+    def metrics(self) -> dict:
+        """Snapshot of queue depth, wait times and rejection counters"""
+        with self._cond:
+            waits = sorted(self._wait_times)
+            return {
+                'queue_depth': self._pending_total - self._active_total,
+                'active': self._active_total,
+                'max_pending': self.max_pending,
+                'max_active': self.max_active,
+                # Counts only: the metrics endpoint is public, so it must
+                # not reveal which users are extracting
+                'users_waiting': len(self._waiting),
+                'users_active': len(self._active),
+                'reserved': sum(self._reserved.values()),
+                'admitted_total': self._admitted,
+                'rejected_total': self._rejected,
+                'timed_out_total': self._timed_out,
+                'wait_seconds': {
+                    'p50': _percentile(waits, 0.50),
+                    'p95': _percentile(waits, 0.95),
+                    'p99': _percentile(waits, 0.99),
+                    'max': waits[-1] if waits else 0.0
+                },
+                'avg_service_seconds': _mean(self._service_times),
+                'retry_after': self._retry_after()
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (caller must hold self._cond)
+    # ------------------------------------------------------------------
+    def _reject_if_saturated(self, user_id: str, chunks: int = 1):
+        if self._pending_total + chunks > self.max_pending:
+            self._rejected += 1
+            raise AdmissionRejected(
+                'Extraction queue is full', self._retry_after())
+        if self._user_load(user_id) + chunks > self.per_user_pending:
+            self._rejected += 1
+            raise AdmissionRejected(
+                'Too many pending extractions for this user',
+                self._retry_after())
+
+    def _user_load(self, user_id: str) -> int:
+        return (len(self._waiting.get(user_id, ())) + self._active.get(user_id, 0)
+                + self._reserved.get(user_id, 0))
+
+    def _unreserve(self, user_id: str, chunks: int):
+        if not chunks:
+            return
+        self._reserved[user_id] -= chunks
+        if self._reserved[user_id] <= 0:
+            del self._reserved[user_id]
+
+    def _dispatch(self):
+        """Grant free slots to waiting users in round-robin order"""
+        while self._active_total < self.max_active and self._waiting:
+            for user_id in list(self._waiting.keys()):
+                if self._active.get(user_id, 0) < self.per_user_active:
+                    break
+            else:
+                break
+
+            tickets = self._waiting[user_id]
+            ticket = tickets.popleft()
+            if tickets:
+                # Rotate the user to the back of the line
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+
+            ticket.granted = True
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+            self._active_total += 1
+
+        # Released slots must always wake waiters re-checking their deadline
+        self._cond.notify_all()
+
+    def _drop_ticket(self, ticket: _Ticket):
+        tickets = self._waiting.get(ticket.user_id)
+        if tickets is not None:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[ticket.user_id]
+        self._pending_total -= 1
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until the current backlog drains"""
+        avg_service = _mean(self._service_times)
+        if not avg_service:
+            return self.default_retry_after
+        backlog = self._pending_total - self._active_total
+        return max(1, math.ceil(avg_service * max(backlog, 1) / self.max_active))
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+# Shared controller guarding every LLM call made by the extraction pipeline
+admission_controller = AdmissionController(
+    max_pending=Config.ADMISSION_MAX_PENDING_CHUNKS,
+    max_active=Config.ADMISSION_MAX_ACTIVE_CHUNKS,
+    per_user_active=Config.ADMISSION_PER_USER_ACTIVE_CHUNKS,
+    per_user_pending=Config.ADMISSION_PER_USER_PENDING_CHUNKS,
+    max_wait_seconds=Config.ADMISSION_MAX_WAIT_SECONDS,
+    default_retry_after=Config.ADMISSION_RETRY_AFTER_SECONDS
+)
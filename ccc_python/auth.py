@@ -1,11 +1,8 @@
 from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from db import db
+from db import storage
 from token_utils import generate_token
-
-# Get users collection
-users_collection = db['users']
+from password_hashing import hash_password, verify_password
 
 
 def create_user(email: str, password: str) -> dict:
@@ -13,23 +10,18 @@ def create_user(email: str, password: str) -> dict:
     if not email or not password:
         raise ValueError('Email and password are required')
 
-    existing_user = users_collection.find_one({'email': email})
+    existing_user = storage.find_user_by_email(email)
     if existing_user:
         raise ValueError('Email already exists')
 
-    hashed_password = generate_password_hash(
-        password, method='pbkdf2:sha256', salt_length=16)
+    hashed_password = hash_password(password)
     user = {
         'email': email,
         'password': hashed_password,
         'created_at': datetime.now()
     }
 
-    result = users_collection.insert_one(user)
-    if not result.inserted_id:
-        raise Exception('Failed to create user')
-
-    user['_id'] = str(result.inserted_id)
+    user['_id'] = storage.insert_user(user)
     del user['password']
 
     # Generate token for the new user
@@ -42,8 +34,8 @@ def verify_user(email: str, password: str) -> dict:
     if not email or not password:
         raise ValueError('Email and password are required')
 
-    user = users_collection.find_one({'email': email})
-    if not user or not check_password_hash(user['password'], password):
+    user = storage.find_user_by_email(email)
+    if not user or not verify_password(user['password'], password):
         raise ValueError('Invalid email or password')
 
     user_data = {
@@ -0,0 +1,136 @@
+"""Compare loading a large transaction history from MongoDB vs the Arrow archive.
+
+Seeds a throwaway MongoDB database and archive folder with synthetic
+transactions, then measures, in a fresh subprocess per run, the wall time
+and peak RSS of:
+
+  mongo    -- find() -> list of dicts -> FinanceProcessor
+  archive  -- memory-mapped Arrow files (feature columns only) -> FinanceProcessor
+
+Usage (from ccc_python/):
+    python benchmarks/bench_archive.py --rows 200000 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+BENCH_DATABASE = 'pdf_processor_bench'
+BENCH_USER = 'bench-user'
+CATEGORIES = ['Income', 'Housing', 'Food', 'Transportation', 'Shopping',
+              'Bills', 'Entertainment', 'Health', 'Education', 'Financial']
+
+
+def synthetic_transactions(rows: int):
+    start = datetime(2020, 1, 1)
+    rng = random.Random(42)
+    for _ in range(rows):
+        yield {
+            'date': start + timedelta(days=rng.randint(0, 365 * 4)),
+            'description': f"Merchant {rng.randint(0, 5000)}",
+            'prefix': rng.choice([1, -1]),
+            'amount': round(rng.uniform(1, 5000), 2),
+            'category': rng.choice(CATEGORIES),
+            'user_id': BENCH_USER,
+            'created_at': datetime.now()
+        }
+
+
+def seed(mongo_uri: str, archive_folder: str, rows: int):
+    from pymongo import MongoClient
+    from config import Config
+    from transaction_archive import archive_transactions
+
+    collection = MongoClient(mongo_uri)[BENCH_DATABASE]['transactions']
+    collection.drop()
+
+    Config.ARCHIVE_ENABLED = True
+    Config.ARCHIVE_FOLDER = archive_folder
+
+    batch = []
+    for doc in synthetic_transactions(rows):
+        batch.append(doc)
+        if len(batch) == 10000:
+            collection.insert_many(batch)
+            archive_transactions(batch, BENCH_USER)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+        archive_transactions(batch, BENCH_USER)
+
+
+def run_single(mode: str, mongo_uri: str, archive_folder: str):
+    """Executed in a child process so peak RSS is isolated per mode"""
+    from config import Config
+    from finance_processor import FinanceProcessor
+
+    started = time.perf_counter()
+    if mode == 'mongo':
+        from pymongo import MongoClient
+        collection = MongoClient(mongo_uri)[BENCH_DATABASE]['transactions']
+        transactions = list(collection.find({'user_id': BENCH_USER}))
+        loaded = time.perf_counter()
+        FinanceProcessor.process_transactions(transactions)
+    else:
+        Config.ARCHIVE_ENABLED = True
+        Config.ARCHIVE_FOLDER = archive_folder
+        from transaction_archive import load_archived_dataframe
+        df = load_archived_dataframe(
+            BENCH_USER, columns=FinanceProcessor.FEATURE_COLUMNS)
+        loaded = time.perf_counter()
+        FinanceProcessor.process_transactions(df)
+    finished = time.perf_counter()
+
+    # ru_maxrss is reported in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        'mode': mode,
+        'load_seconds': loaded - started,
+        'total_seconds': finished - started,
+        'peak_rss_mb': peak_rss_mb
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--single', choices=['mongo', 'archive'],
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--archive-folder', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single, args.mongo_uri, args.archive_folder)
+        return
+
+    with tempfile.TemporaryDirectory() as archive_folder:
+        print(f"Seeding {args.rows} transactions...", flush=True)
+        seed(args.mongo_uri, archive_folder, args.rows)
+
+        print(f"{'mode':<10}{'load (s)':>12}{'total (s)':>12}{'peak RSS (MB)':>16}")
+        for mode in ('mongo', 'archive'):
+            for _ in range(args.repeat):
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__),
+                    '--single', mode,
+                    '--mongo-uri', args.mongo_uri,
+                    '--archive-folder', archive_folder
+                ])
+                result = json.loads(output.decode().strip().splitlines()[-1])
+                print(f"{mode:<10}{result['load_seconds']:>12.3f}"
+                      f"{result['total_seconds']:>12.3f}{result['peak_rss_mb']:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
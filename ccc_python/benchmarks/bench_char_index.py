@@ -0,0 +1,88 @@
+"""Compare per-box within_bbox extraction against the page char index.
+
+For each combination of box count and page density (share of the page's
+chars kept), times extracting layout text for a grid of boxes with:
+
+  within_bbox -- page.within_bbox(bbox).extract_text(...) per box (previous path)
+  char_index  -- one PageCharIndex per page, then one query per box
+
+and checks that both produce identical text.
+
+Usage (from ccc_python/):
+    python benchmarks/bench_char_index.py --pdf ../1.pdf --page 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pdfplumber
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from char_index import PageCharIndex  # noqa: E402
+
+TEXT_SETTINGS = dict(layout=True, y_density=9, x_density=9)
+
+
+def grid_boxes(page, count: int) -> list:
+    """Split the page into `count` horizontal bands, each cut into two columns"""
+    x0, top, x1, bottom = (float(v) for v in page.bbox)
+    rows = max(1, count // 2)
+    height = (bottom - top) / rows
+    middle = (x0 + x1) / 2
+    boxes = []
+    for row in range(rows):
+        band_top = top + row * height
+        band_bottom = band_top + height
+        boxes.append((x0, band_top, middle, band_bottom))
+        boxes.append((middle, band_top, x1, band_bottom))
+    return boxes[:count]
+
+
+def thin_page(page, keep: float, seed: int = 7):
+    """Derived page keeping only a share of the chars to vary density"""
+    rng = random.Random(seed)
+    return page.filter(lambda obj: obj.get('object_type') != 'char' or rng.random() < keep)
+
+
+def time_within_bbox(page, boxes: list) -> tuple:
+    started = time.perf_counter()
+    texts = [page.within_bbox(bbox).extract_text(**TEXT_SETTINGS) for bbox in boxes]
+    return time.perf_counter() - started, texts
+
+
+def time_char_index(page, boxes: list) -> tuple:
+    started = time.perf_counter()
+    char_index = PageCharIndex(page)
+    texts = [char_index.extract_text(bbox, **TEXT_SETTINGS) for bbox in boxes]
+    return time.perf_counter() - started, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', default=os.path.join('..', '1.pdf'))
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--boxes', type=int, nargs='+', default=[2, 8, 32, 128])
+    parser.add_argument('--density', type=float, nargs='+', default=[0.25, 0.5, 1.0])
+    args = parser.parse_args()
+
+    with pdfplumber.open(args.pdf) as pdf:
+        base_page = pdf.pages[args.page - 1]
+        print(f"{'density':>8}{'chars':>8}{'boxes':>7}{'within_bbox (s)':>17}"
+              f"{'char_index (s)':>16}{'speedup':>9}{'equal':>7}")
+        for density in args.density:
+            page = thin_page(base_page, density) if density < 1 else base_page
+            char_count = len(page.chars)
+            for count in args.boxes:
+                boxes = grid_boxes(page, count)
+                baseline, expected = time_within_bbox(page, boxes)
+                indexed, actual = time_char_index(page, boxes)
+                print(f"{density:>8.2f}{char_count:>8}{count:>7}{baseline:>17.3f}"
+                      f"{indexed:>16.3f}{baseline / indexed:>8.1f}x{str(expected == actual):>7}")
+
+
+if __name__ == '__main__':
+    main()
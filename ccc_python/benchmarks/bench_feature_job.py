@@ -0,0 +1,68 @@
+"""Measure how the nightly feature job scales with worker processes.
+
+Seeds a throwaway MongoDB database with synthetic users (loadtest/seed.py),
+then runs run_feature_job over all of them once per worker count and
+reports users per second, the speedup over one worker and the parallel
+efficiency (speedup / workers). Each run uses a fresh run ID, so no user is
+skipped as already done.
+
+Usage (from ccc_python/):
+    python benchmarks/bench_feature_job.py --users 2000 --transactions 2000 \\
+        --workers 1 2 4 8 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'loadtest'))
+
+from feature_job import run_feature_job  # noqa: E402
+from seed import seed  # noqa: E402
+
+BENCH_DATABASE = 'pdf_processor_feature_bench'
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--transactions', type=int, default=2000,
+                        help='transactions per user')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, cores}))
+    parser.add_argument('--partition-size', type=int, default=50)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='reuse the data from a previous run')
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f"Seeding {args.users} users x {args.transactions} transactions...",
+              flush=True)
+        seed(args.mongo_uri, BENCH_DATABASE, args.users, args.transactions,
+             args.months)
+
+    print(f"{cores} CPU cores")
+    print(f"{'workers':>8}{'seconds':>10}{'users/s':>10}{'speedup':>9}"
+          f"{'efficiency':>12}")
+    # Speedup and efficiency are relative to the first (smallest) worker count
+    base_workers, base_rate = None, None
+    for workers in sorted(args.workers):
+        summary = run_feature_job(workers=workers,
+                                  partition_size=args.partition_size,
+                                  mongo_uri=args.mongo_uri,
+                                  database=BENCH_DATABASE)
+        rate = summary['processed'] / summary['elapsed_seconds']
+        if base_rate is None:
+            base_workers, base_rate = workers, rate
+        speedup = rate / base_rate
+        efficiency = speedup / (workers / base_workers)
+        print(f"{workers:>8}{summary['elapsed_seconds']:>10.1f}{rate:>10.1f}"
+              f"{speedup:>8.1f}x{efficiency:>11.0%}")
+
+
+if __name__ == '__main__':
+    main()
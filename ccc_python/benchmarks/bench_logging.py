@@ -0,0 +1,79 @@
+"""Measure per-row logging overhead on the ingestion hot path.
+
+Simulates the save_transactions loop and compares the caller-side cost of:
+
+  print        -- print(..., flush=True) per row (previous behaviour)
+  queue-info   -- structured INFO record per row through the queue handler
+  queue-sample -- sampled DEBUG per-row event with the logger at DEBUG
+  disabled     -- per-row DEBUG event with the logger at INFO (production)
+
+Output goes to a temporary file so each flush is a real write syscall.
+
+Usage (from ccc_python/):
+    python benchmarks/bench_logging.py --rows 100000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from log_utils import (setup_logging, shutdown_logging, get_logger, sampled,  # noqa: E402
+                       dropped_records)
+
+
+def run_print(rows: int, stream):
+    for i in range(rows):
+        print(f"Transaction successfully saved to MongoDB with ID: {i:024x}",
+              file=stream, flush=True)
+
+
+def run_logger(rows: int, logger, use_sampling: bool):
+    for i in range(rows):
+        if use_sampling:
+            if logger.isEnabledFor(logging.DEBUG) and sampled('bench'):
+                logger.debug("Transaction saved to MongoDB",
+                             extra={'fields': {'transaction_id': f"{i:024x}"}})
+        else:
+            logger.info("Transaction saved to MongoDB",
+                        extra={'fields': {'transaction_id': f"{i:024x}"}})
+
+
+def measure(mode: str, rows: int) -> tuple:
+    with tempfile.TemporaryFile('w') as stream:
+        if mode == 'print':
+            started = time.perf_counter()
+            run_print(rows, stream)
+            caller = time.perf_counter() - started
+            return caller, caller, 0
+
+        level = 'INFO' if mode in ('queue-info', 'disabled') else 'DEBUG'
+        setup_logging(level=level, stream=stream)
+        logger = get_logger('bench')
+        started = time.perf_counter()
+        run_logger(rows, logger, use_sampling=(mode != 'queue-info'))
+        caller = time.perf_counter() - started
+        dropped = dropped_records()
+        # Include the background drain so total cost is visible too
+        shutdown_logging()
+        return caller, time.perf_counter() - started, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'caller (s)':>12}{'us/row':>10}{'incl. drain (s)':>18}{'dropped':>10}")
+    for mode in ('print', 'queue-info', 'queue-sample', 'disabled'):
+        caller, total, dropped = measure(mode, args.rows)
+        print(f"{mode:<14}{caller:>12.3f}{caller / args.rows * 1e6:>10.2f}"
+              f"{total:>18.3f}{dropped:>10}")
+
+
+if __name__ == '__main__':
+    main()
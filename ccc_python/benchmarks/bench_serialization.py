@@ -0,0 +1,104 @@
+"""Compare /api/transactions response encoding and compression.
+
+Builds MongoDB-shaped transaction documents (ObjectId, datetime) plus the
+monthly finance features for one user and times:
+
+  flask -- stringify each document, to_dict(orient='records') and Flask's
+           default JSON provider (previous path)
+  fast  -- FastJSONProvider on the raw documents and frame_records
+
+then reports the payload size uncompressed, with gzip and with brotli.
+
+Usage (from ccc_python/):
+    python benchmarks/bench_serialization.py --transactions 1000 10000 50000
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'loadtest'))
+
+from config import Config  # noqa: E402
+from finance_processor import FinanceProcessor  # noqa: E402
+from seed import user_transactions  # noqa: E402
+from serialization import brotli, dumps_bytes, frame_records, orjson  # noqa: E402
+
+
+def documents(count: int) -> list:
+    rows = list(user_transactions('bench-user', count, 24, random.Random(42)))
+    for row in rows:
+        row['_id'] = ObjectId()
+    return rows
+
+
+def encode_flask(transactions: list, features) -> bytes:
+    provider = DefaultJSONProvider(Flask(__name__))
+    transactions = [dict(t) for t in transactions]
+    for transaction in transactions:
+        transaction['_id'] = str(transaction['_id'])
+        transaction['created_at'] = transaction['created_at'].isoformat()
+        transaction['date'] = transaction['date'].isoformat()
+    features = features.assign(month=features['month'].astype(str))
+    return provider.dumps({
+        'transactions': transactions,
+        'finance_features': features.to_dict(orient='records')
+    }).encode('utf-8')
+
+
+def encode_fast(transactions: list, features) -> bytes:
+    return dumps_bytes({
+        'transactions': transactions,
+        'finance_features': frame_records(features)
+    })
+
+
+def timed(function, *args, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson else 'no'}, brotli: {'yes' if brotli else 'no'}")
+    print(f"{'rows':>7}{'flask ms':>10}{'fast ms':>9}{'speedup':>9}{'raw KB':>9}"
+          f"{'gzip KB':>9}{'gzip ms':>9}{'br KB':>8}{'br ms':>7}")
+    for count in args.transactions:
+        transactions = documents(count)
+        features = FinanceProcessor.process_transactions(transactions)
+
+        flask_seconds, _ = timed(encode_flask, transactions, features)
+        fast_seconds, body = timed(encode_fast, transactions, features)
+        gzip_seconds, gzipped = timed(
+            gzip.compress, body, Config.RESPONSE_GZIP_LEVEL)
+        if brotli is not None:
+            br_seconds, brotlied = timed(
+                lambda data: brotli.compress(data, quality=Config.RESPONSE_BROTLI_QUALITY),
+                body)
+            br_size, br_ms = f"{len(brotlied) / 1024:>8.0f}", f"{br_seconds * 1000:>7.1f}"
+        else:
+            br_size, br_ms = f"{'-':>8}", f"{'-':>7}"
+
+        print(f"{count:>7}{flask_seconds * 1000:>10.1f}{fast_seconds * 1000:>9.1f}"
+              f"{flask_seconds / fast_seconds:>8.1f}x{len(body) / 1024:>9.0f}"
+              f"{len(gzipped) / 1024:>9.0f}{gzip_seconds * 1000:>9.1f}{br_size}{br_ms}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare feature queries on the embedded storage backends.
+
+Loads synthetic users into a throwaway DuckDB and SQLite database and times,
+per user:
+
+  rows -- find_transactions + FinanceProcessor.process_transactions
+          (what the MongoDB path does after fetching documents)
+  sql  -- monthly_aggregates in SQL + FinanceProcessor.features_from_aggregates
+
+Usage (from ccc_python/):
+    python benchmarks/bench_storage.py --users 20 --transactions 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'loadtest'))
+
+from finance_processor import FinanceProcessor  # noqa: E402
+from seed import user_id_for, user_transactions  # noqa: E402
+from storage import DuckDBStorage, SQLiteStorage, duckdb  # noqa: E402
+
+
+def load(storage, users: int, transactions: int, months: int) -> float:
+    rng = random.Random(42)
+    started = time.perf_counter()
+    for index in range(users):
+        storage.insert_transactions(list(user_transactions(
+            user_id_for(index), transactions, months, rng)))
+    return time.perf_counter() - started
+
+
+def time_queries(storage, users: int) -> tuple:
+    started = time.perf_counter()
+    for index in range(users):
+        FinanceProcessor.process_transactions(
+            storage.find_transactions(user_id_for(index)))
+    rows = (time.perf_counter() - started) / users
+
+    started = time.perf_counter()
+    for index in range(users):
+        FinanceProcessor.features_from_aggregates(
+            storage.monthly_aggregates(user_id_for(index)))
+    sql = (time.perf_counter() - started) / users
+    return rows, sql
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=5000,
+                        help='transactions per user')
+    parser.add_argument('--months', type=int, default=24)
+    args = parser.parse_args()
+
+    backends = [('sqlite', SQLiteStorage)]
+    if duckdb is not None:
+        backends.insert(0, ('duckdb', DuckDBStorage))
+
+    print(f"{'backend':>8}{'load (s)':>10}{'rows (ms/user)':>16}"
+          f"{'sql (ms/user)':>15}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, backend in backends:
+            storage = backend(os.path.join(folder, f'bench.{name}'))
+            load_seconds = load(storage, args.users, args.transactions, args.months)
+            rows, sql = time_queries(storage, args.users)
+            print(f"{name:>8}{load_seconds:>10.2f}{rows * 1000:>16.1f}"
+                  f"{sql * 1000:>15.1f}{rows / sql:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Compare per-row transaction dicts with TransactionBatch.
+
+Starts from parsed Transaction models (what the LLM parser returns) and
+measures, per stage:
+
+  build    -- model_dump() + created_at/user_id per row (previous parser
+              output) vs TransactionBatch.from_transactions plus
+              stamp_created_at
+  features -- FinanceProcessor.process_transactions on the dicts vs the batch
+  write    -- insert_transactions(dicts) vs insert_transaction_batch into a
+              throwaway embedded database (DuckDB if installed, else SQLite)
+  read     -- find_transactions vs find_transaction_batch of the feature
+              columns
+
+Times are the best of --repeat runs. Memory is measured separately with
+tracemalloc: 'kept' is what the stage's result holds on to, 'peak' the
+high-water mark while it runs. Inputs shared by both sides are excluded.
+
+Usage (from ccc_python/):
+    python benchmarks/bench_transaction_batch.py --transactions 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'loadtest'))
+
+from finance_processor import FinanceProcessor  # noqa: E402
+from seed import user_transactions  # noqa: E402
+from storage import DuckDBStorage, SQLiteStorage, duckdb  # noqa: E402
+from transaction_batch import TransactionBatch  # noqa: E402
+
+USER_ID = 'bench-user'
+
+
+class Transaction(BaseModel):
+    # Same fields as transaction_processor.Transaction, which can't be
+    # imported without a database connection
+    date: datetime
+    description: str
+    prefix: int
+    amount: float
+    category: Optional[str]
+    user_id: str
+
+
+def parsed_transactions(count: int) -> list:
+    return [Transaction(**row) for row in user_transactions(
+        USER_ID, count, 24, random.Random(42))]
+
+
+def build_documents(transactions: list) -> list:
+    created_at = datetime.now()
+    documents = []
+    for transaction in transactions:
+        document = transaction.model_dump()
+        document['created_at'] = created_at
+        document['user_id'] = USER_ID
+        documents.append(document)
+    return documents
+
+
+def build_batch(transactions: list) -> TransactionBatch:
+    # Storage stamps created_at on write; do it here too so both sides match
+    batch = TransactionBatch.from_transactions(transactions, USER_ID)
+    batch.stamp_created_at()
+    return batch
+
+
+def timed(function, *args, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measured(function, *args) -> tuple:
+    """(kept bytes, peak bytes) allocated by function(*args)"""
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return kept, peak
+
+
+def open_storage(folder: str, name: str):
+    backend = DuckDBStorage if duckdb is not None else SQLiteStorage
+    return backend(os.path.join(folder, name))
+
+
+def write_stage(folder: str, repeat: int):
+    """Insert functions that each write into a fresh database file"""
+    runs = iter(range(repeat * 4))
+
+    def insert_documents(documents):
+        storage = open_storage(folder, f'documents-{next(runs)}.db')
+        return storage.insert_transactions([dict(d) for d in documents])
+
+    def insert_batch(batch):
+        storage = open_storage(folder, f'batch-{next(runs)}.db')
+        return storage.insert_transaction_batch(batch)
+
+    return insert_documents, insert_batch
+
+
+def report(stage: str, old: tuple, new: tuple):
+    (old_seconds, old_kept, old_peak), (new_seconds, new_kept, new_peak) = old, new
+    print(f"{stage:>9}{old_seconds * 1000:>10.1f}{new_seconds * 1000:>10.1f}"
+          f"{old_seconds / new_seconds:>8.1f}x"
+          f"{old_kept / 2**20:>10.1f}{new_kept / 2**20:>10.1f}"
+          f"{old_peak / 2**20:>10.1f}{new_peak / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    transactions = parsed_transactions(args.transactions)
+    documents = build_documents(transactions)
+    batch = build_batch(transactions)
+
+    print(f"{args.transactions} transactions, writes to "
+          f"{'duckdb' if duckdb is not None else 'sqlite'}")
+    print(f"{'stage':>9}{'dicts ms':>10}{'batch ms':>10}{'speedup':>9}"
+          f"{'dicts MB':>10}{'batch MB':>10}{'peak MB':>10}{'peak MB':>10}")
+
+    def run(stage, old_function, old_input, new_function, new_input):
+        old_seconds, _ = timed(old_function, old_input, repeat=args.repeat)
+        new_seconds, _ = timed(new_function, new_input, repeat=args.repeat)
+        report(stage, (old_seconds, *measured(old_function, old_input)),
+               (new_seconds, *measured(new_function, new_input)))
+
+    run('build', build_documents, transactions, build_batch, transactions)
+    run('features', FinanceProcessor.process_transactions, documents,
+        FinanceProcessor.process_transactions, batch)
+
+    with tempfile.TemporaryDirectory() as folder:
+        insert_documents, insert_batch = write_stage(folder, args.repeat)
+        run('write', insert_documents, documents, insert_batch, batch)
+
+        storage = open_storage(folder, 'read.db')
+        storage.insert_transaction_batch(batch)
+        run('read',
+            lambda user_id: storage.find_transactions(
+                user_id, FinanceProcessor.FEATURE_COLUMNS), USER_ID,
+            lambda user_id: storage.find_transaction_batch(
+                user_id, FinanceProcessor.FEATURE_COLUMNS), USER_ID)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Ingest a whole directory of statements using saved layout templates.
+
+Each PDF is fingerprinted and matched against the user's layout templates
+(or forced onto one with --template). Matched files are extracted and
+parsed in parallel and their transactions saved for the user. Source files
+are read in place and never deleted; re-running over the same folder skips
+statements whose pages were already extracted with the same boxes.
+
+Usage (from ccc_python/):
+    python bulk_ingest.py STATEMENT_DIR --user-id USER_ID [--template NAME]
+                          [--workers 4] [--report report.json]
+"""
+import argparse
+import contextvars
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from log_utils import setup_logging, get_logger, correlation_scope
+
+# Configure logging before importing modules that log at import time
+setup_logging()
+
+from admission import AdmissionController  # noqa: E402
+from config import Config  # noqa: E402
+from layout_templates import compute_fingerprint, get_template, match_template  # noqa: E402
+from document_ingest import ingest_document  # noqa: E402
+
+logger = get_logger(__name__)
+
+
+def ingest_file(filepath: str, user_id: str, template: dict = None,
+                admission: AdmissionController = None) -> dict:
+    """Extract and save transactions for one statement"""
+    result = {'file': os.path.basename(filepath), 'template': None,
+              'pages': 0, 'pages_unchanged': 0, 'transactions': 0, 'error': None}
+    try:
+        if template is None:
+            template = match_template(user_id, compute_fingerprint(filepath))
+            if template is None:
+                result['error'] = 'No matching layout template'
+                return result
+        result['template'] = template['name']
+
+        # Source files stay in place, so there is no need to retain a copy
+        # for retries
+        for page_summary in ingest_document(filepath, result['file'],
+                                            template['boxes'], user_id,
+                                            retain_file=False,
+                                            admission=admission):
+            if page_summary['status'] == 'unchanged':
+                result['pages_unchanged'] += 1
+                continue
+            result['pages'] += 1
+            result['transactions'] += page_summary['transactions']
+    except Exception as e:
+        logger.exception(f"Error ingesting {filepath}: {str(e)}")
+        result['error'] = str(e)
+    return result
+
+
+def ingest_directory(directory: str, user_id: str, template_name: str = None,
+                     workers: int = 4) -> list:
+    """Ingest every PDF under directory in parallel and return per-file results"""
+    filepaths = sorted(
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(directory)
+        for filename in filenames if filename.lower().endswith('.pdf'))
+    template = get_template(user_id, template_name) if template_name else None
+
+    # A batch run belongs to one user; give its workers the global LLM
+    # capacity instead of the interactive per-user share, without touching
+    # the limits of the shared controller
+    admission = AdmissionController(
+        max_pending=Config.ADMISSION_MAX_PENDING_CHUNKS,
+        max_active=Config.ADMISSION_MAX_ACTIVE_CHUNKS,
+        per_user_active=Config.ADMISSION_MAX_ACTIVE_CHUNKS,
+        per_user_pending=max(Config.ADMISSION_PER_USER_PENDING_CHUNKS, workers),
+        max_wait_seconds=Config.ADMISSION_MAX_WAIT_SECONDS,
+        default_retry_after=Config.ADMISSION_RETRY_AFTER_SECONDS)
+
+    logger.info("Bulk ingestion started", extra={'fields': {
+        'files': len(filepaths), 'workers': workers, 'user_id': user_id}})
+    started = time.perf_counter()
+    results = []
+    # Threads suffice: each file spends most of its time waiting on the LLM
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Copy the context per task so worker logs keep the job ID
+        futures = [executor.submit(contextvars.copy_context().run,
+                                   ingest_file, filepath, user_id, template,
+                                   admission)
+                   for filepath in filepaths]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            logger.info("Bulk ingestion progress", extra={'fields': {
+                'files_done': completed, 'files': len(filepaths),
+                'file': result['file'], 'error': result['error']}})
+
+    logger.info("Bulk ingestion finished", extra={'fields': {
+        'files': len(results),
+        'failed': sum(1 for r in results if r['error']),
+        'transactions': sum(r['transactions'] for r in results),
+        'elapsed_seconds': round(time.perf_counter() - started, 1)}})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='folder containing PDF statements')
+    parser.add_argument('--user-id', required=True,
+                        help='owner of the ingested transactions')
+    parser.add_argument('--template', default=None,
+                        help='apply this template instead of auto-matching')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='statements processed concurrently')
+    parser.add_argument('--report', default=None,
+                        help='write per-file results to this JSON file')
+    args = parser.parse_args()
+
+    with correlation_scope(job_id=uuid.uuid4().hex):
+        results = ingest_directory(args.directory, args.user_id,
+                                   args.template, args.workers)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
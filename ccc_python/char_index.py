@@ -0,0 +1,60 @@
+import numpy as np
+from pdfplumber import utils as pdf_utils
+
+
+class PageCharIndex:
+    """Array-backed spatial index over a page's characters.
+
+    The page's chars are read once; their bounding boxes are kept in NumPy
+    arrays sorted by `top`. Each box query binary-searches the vertical
+    range and filters the candidates with a vectorized mask, instead of
+    building a cropped page that re-filters every object on the page.
+    Text is produced by pdfplumber's own layout engine, so the output
+    matches `page.within_bbox(bbox).extract_text(layout=True, ...)`.
+    """
+
+    def __init__(self, page):
+        self.page_bbox = tuple(page.bbox)
+        self.chars = page.chars
+
+        coords = np.array([(c['x0'], c['top'], c['x1'], c['bottom'])
+                           for c in self.chars], dtype=np.float64).reshape(-1, 4)
+        self._order = np.argsort(coords[:, 1], kind='stable')
+        sorted_coords = coords[self._order]
+        self._x0 = sorted_coords[:, 0]
+        self._top = sorted_coords[:, 1]
+        self._x1 = sorted_coords[:, 2]
+        self._bottom = sorted_coords[:, 3]
+
+    def chars_within(self, bbox: tuple) -> list:
+        """Chars lying fully inside bbox, in original page order"""
+        x0, top, x1, bottom = bbox
+        start = np.searchsorted(self._top, top, side='left')
+        end = np.searchsorted(self._top, bottom, side='right')
+        mask = ((self._x0[start:end] >= x0) & (self._x1[start:end] <= x1) &
+                (self._bottom[start:end] <= bottom))
+        indices = np.sort(self._order[start:end][mask])
+        return [self.chars[i] for i in indices]
+
+    def extract_text(self, bbox: tuple, **kwargs) -> str:
+        """Layout text for bbox, equivalent to within_bbox(bbox).extract_text"""
+        self._check_bbox(bbox)
+        x0, top, x1, bottom = bbox
+        layout = {'layout_bbox': bbox}
+        if 'layout_width_chars' not in kwargs:
+            layout['layout_width'] = x1 - x0
+        if 'layout_height_chars' not in kwargs:
+            layout['layout_height'] = bottom - top
+        return pdf_utils.chars_to_textmap(
+            self.chars_within(bbox), **{**layout, **kwargs}).as_string
+
+    def _check_bbox(self, bbox: tuple):
+        # Same validation pdfplumber applies when cropping with strict=True
+        bbox_area = pdf_utils.calculate_area(bbox)
+        if bbox_area == 0:
+            raise ValueError(f"Bounding box {bbox} has an area of zero.")
+        overlap = pdf_utils.get_bbox_overlap(bbox, self.page_bbox)
+        if overlap is None or pdf_utils.calculate_area(overlap) < bbox_area:
+            raise ValueError(
+                f"Bounding box {bbox} is not fully within "
+                f"parent page bounding box {self.page_bbox}")
@@ -1,4 +1,4 @@
-from os import path, makedirs
+from os import path, makedirs, environ
 
 # Flask app configuration
 
@@ -7,13 +7,73 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'pdf'}
 
-    # MongoDB Configuration
-    MONGODB_URI = 'mongodb://localhost:27017'
-    MONGODB_DATABASE = 'pdf_processor'
+    # MongoDB Configuration (overridable for load tests and batch jobs)
+    MONGODB_URI = environ.get('MONGODB_URI', 'mongodb://localhost:27017')
+    MONGODB_DATABASE = environ.get('MONGODB_DATABASE', 'pdf_processor')
+
+    # Storage backend: 'mongo', or 'duckdb'/'sqlite' for an embedded
+    # single-file database that needs no MongoDB server
+    STORAGE_BACKEND = environ.get('STORAGE_BACKEND', 'mongo')
+    EMBEDDED_DB_PATH = environ.get('EMBEDDED_DB_PATH', 'ccc.db')
+
+    # Loan model files
+    MODEL_PATH = environ.get('MODEL_PATH', 'models/')
 
     # JWT Configuration
     JWT_SECRET_KEY = 'your-super-secret-key-please-change-in-production'
 
+    # Authentication
+    AUTH_REQUIRED = False              # reject API calls without a bearer token
+    AUTH_HASH_WORKERS = 2              # threads dedicated to password hashing
+    AUTH_HASH_MAX_PENDING = 32         # hashes running + waiting before 429
+    AUTH_RETRY_AFTER_SECONDS = 5
+    TOKEN_CACHE_SIZE = 10000           # verified tokens kept in memory
+
+    # Logging
+    LOG_LEVEL = 'INFO'
+    LOG_QUEUE_SIZE = 10000
+    LOG_SAMPLE_EVERY = 100  # emit one in N per-row debug events
+
+    # JSON response compression (brotli when installed, otherwise gzip)
+    RESPONSE_COMPRESS_MIN_BYTES = 1024
+    RESPONSE_GZIP_LEVEL = 6
+    RESPONSE_BROTLI_QUALITY = 4
+
+    # Streaming ingestion pipeline
+    PIPELINE_PAGE_BUFFER = 2          # extracted pages waiting to be parsed
+    PIPELINE_WRITE_BATCH_SIZE = 500   # rows per insert when not writing per page
+    PIPELINE_WRITE_BUFFER = 4         # batches waiting to be written
+
+    # Layout templates
+    LAYOUT_TEMPLATES_COLLECTION = 'layout_templates'
+    TEMPLATE_HEADER_FRACTION = 0.15  # top share of page 1 used for fingerprinting
+
+    # Per-document extraction state, keyed by user and PDF content hash
+    DOCUMENTS_COLLECTION = 'ingested_documents'
+    # Parsed LLM chunks of pages not yet committed, reused on retry
+    CHUNK_CHECKPOINTS_COLLECTION = 'ingestion_chunks'
+    # Uploaded PDFs are kept here until every page has been ingested
+    DOCUMENT_STORE_FOLDER = 'documents'
+    # A 'processing' document not updated for this long is treated as
+    # abandoned (e.g. after a crash) and may be claimed by another run
+    DOCUMENT_LEASE_SECONDS = 900
+
+    # Precomputed monthly features (written by feature_job.py)
+    FEATURES_COLLECTION = 'monthly_features'
+    FEATURE_JOB_CHECKPOINTS_COLLECTION = 'feature_job_checkpoints'
+
+    # Columnar transaction archive (requires pyarrow)
+    ARCHIVE_ENABLED = False
+    ARCHIVE_FOLDER = 'archive'
+
+    # Admission control for LLM extraction
+    ADMISSION_MAX_PENDING_CHUNKS = 64      # global bound on queued + running chunks
+    ADMISSION_MAX_ACTIVE_CHUNKS = 4        # chunks sent to the LLM concurrently
+    ADMISSION_PER_USER_ACTIVE_CHUNKS = 1   # concurrent LLM chunks per user
+    ADMISSION_PER_USER_PENDING_CHUNKS = 16  # queued + running chunks per user
+    ADMISSION_MAX_WAIT_SECONDS = 120
+    ADMISSION_RETRY_AFTER_SECONDS = 30
+
     @staticmethod
     def init_app():
         if not path.exists(Config.UPLOAD_FOLDER):
@@ -28,7 +88,7 @@ class CORSConfig:
             "origins": ["http://localhost:5173", "http://127.0.0.1:5173"],
             "methods": ["GET", "POST", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization", "Accept"],
-            "expose_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["Content-Type", "Authorization", "Retry-After"],
             "supports_credentials": True,
             "send_wildcard": False
         }
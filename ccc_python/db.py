@@ -1,9 +1,13 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from config import Config
+from log_utils import get_logger
+from storage import create_storage
 import sys
 import time
 
+logger = get_logger(__name__)
+
 
 def get_mongodb_client():
     """Initialize MongoDB client with connection pooling and retry logic"""
@@ -23,24 +27,32 @@ def get_mongodb_client():
             )
             # Test the connection
             client.server_info()
-            print("Successfully connected to MongoDB", flush=True)
+            logger.info("Successfully connected to MongoDB")
             return client
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
             if attempt < max_retries - 1:
-                print(f"""MongoDB connection attempt {
-                      attempt + 1} failed: {str(e)}. Retrying...""", flush=True)
+                logger.warning(f"""MongoDB connection attempt {
+                               attempt + 1} failed: {str(e)}. Retrying...""")
                 time.sleep(retry_delay)
             else:
-                print(f"Failed to connect to MongoDB after {max_retries} attempts: {str(e)}",
-                      file=sys.stderr, flush=True)
+                logger.critical(
+                    f"Failed to connect to MongoDB after {max_retries} attempts: {str(e)}")
                 sys.exit(1)
         except Exception as e:
-            print(f"Unexpected error connecting to MongoDB: {str(e)}",
-                  file=sys.stderr, flush=True)
+            logger.critical(f"Unexpected error connecting to MongoDB: {str(e)}")
             sys.exit(1)
 
 
-# Initialize MongoDB client and collections
-client = get_mongodb_client()
-db = client[Config.MONGODB_DATABASE]
-transactions_collection = db['transactions']
+if Config.STORAGE_BACKEND == 'mongo':
+    # Initialize MongoDB client and collections
+    client = get_mongodb_client()
+    db = client[Config.MONGODB_DATABASE]
+    transactions_collection = db['transactions']
+    features_collection = db[Config.FEATURES_COLLECTION]
+else:
+    # Embedded backends keep everything in Config.EMBEDDED_DB_PATH
+    client = db = transactions_collection = features_collection = None
+
+storage = create_storage(Config.STORAGE_BACKEND, db)
+logger.info("Storage backend ready", extra={'fields': {
+    'backend': Config.STORAGE_BACKEND}})
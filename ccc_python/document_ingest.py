@@ -0,0 +1,224 @@
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime
+
+from admission import admission_controller
+from config import Config
+from db import storage
+from ingest_pipeline import stream_document
+from log_utils import get_logger
+from transaction_archive import archive_available, backfill_archive
+from transaction_batch import TransactionBatch
+from transaction_processor import DocumentBusy, DocumentLease, save_page_transactions
+from utils import user_folder_name
+
+logger = get_logger(__name__)
+
+
+def document_hash(filepath: str) -> str:
+    """SHA-256 of the PDF bytes; identifies a statement across uploads"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _retained_path(user_id: str, content_hash: str) -> str:
+    return os.path.join(Config.DOCUMENT_STORE_FOLDER, user_folder_name(user_id),
+                        f'{content_hash}.pdf')
+
+
+def diff_page_boxes(previous_pages: dict, boxes: dict) -> tuple:
+    """Split pages into (changed, unchanged, removed) lists of page numbers.
+
+    A page is unchanged when its boxes, in order, equal those of its last
+    successful extraction; the order matters because it sets the text order.
+    Pages extracted before but absent from `boxes` are removed.
+    """
+    changed, unchanged = [], []
+    for page, page_boxes in boxes.items():
+        if not page_boxes:
+            continue
+        previous = previous_pages.get(str(page))
+        if previous is not None and previous.get('boxes') == list(page_boxes):
+            unchanged.append(str(page))
+        else:
+            changed.append(str(page))
+    active = set(changed) | set(unchanged)
+    removed = [page for page in previous_pages if page not in active]
+    return changed, unchanged, removed
+
+
+def ingest_document(filepath: str, filename: str, boxes: dict, user_id: str,
+                    content_hash: str = None, retain_file: bool = True,
+                    **pipeline_options):
+    """Extract a statement, re-running only the pages whose boxes changed.
+
+    Submissions are keyed by (user_id, content hash). Pages whose boxes
+    match the previous extraction are skipped entirely, changed pages go
+    through stream_document and atomically replace their previous rows,
+    and pages that no longer have boxes have their rows deleted.
+
+    The document record keeps the submitted boxes and a status of
+    'processing', 'incomplete' or 'complete'. Until it is complete, a copy
+    of the PDF is retained (unless retain_file is False because the caller's
+    file is permanent) so retry_document can resume it.
+
+    Before any page is parsed, admission capacity is reserved for the
+    changed pages (`admission`, the shared admission_controller by
+    default), so a saturated queue rejects the document up front with
+    AdmissionRejected instead of partway through.
+
+    Setting 'processing' is a lease: while another run holds it, and has
+    updated the document within DOCUMENT_LEASE_SECONDS, DocumentBusy is
+    raised and nothing is changed. The lease is renewed on every chunk
+    checkpoint and confirmed before every page commit; a run that lost it
+    stops with DocumentBusy and leaves the document to the new owner.
+
+    Yields stream_document page summaries with an added 'status' of
+    'extracted', 'unchanged' or 'removed'.
+    """
+    boxes = {str(page): page_boxes for page, page_boxes in boxes.items()}
+    content_hash = content_hash or document_hash(filepath)
+    admission = pipeline_options.pop('admission', None) or admission_controller
+    retained_path = _retained_path(user_id, content_hash)
+
+    lease = DocumentLease(user_id, content_hash)
+    lease.claim()
+    # Read after claiming, so no other run can change the pages meanwhile
+    previous_pages = storage.find_document(user_id, content_hash)['pages']
+
+    deleted_rows = []
+    page_errors = []
+    lock = threading.Lock()
+    finished = False
+
+    def record_page(page_number: int, saved: int, deleted: int, **state):
+        # Called from the pipeline's writer thread once the page is committed
+        storage.save_document_page(user_id, content_hash, page_number, {
+            'boxes': list(boxes[str(page_number)]),
+            'transactions': saved,
+            'extracted_at': datetime.now().isoformat(),
+            **state})
+        with lock:
+            deleted_rows.append(deleted)
+
+    def clear_page(page: str):
+        _, deleted = save_page_transactions(
+            TransactionBatch.empty(user_id, content_hash), int(page))
+        deleted_rows.append(deleted)
+
+    try:
+        source_path = os.path.abspath(filepath)
+        if retain_file and source_path != os.path.abspath(retained_path):
+            os.makedirs(os.path.dirname(retained_path), exist_ok=True)
+            shutil.copyfile(filepath, retained_path)
+            source_path = os.path.abspath(retained_path)
+        storage.save_document(user_id, content_hash, filename=filename, boxes=boxes,
+                              file_path=source_path, error=None)
+
+        changed, unchanged, removed = diff_page_boxes(previous_pages, boxes)
+        logger.info("Diffed document boxes", extra={'fields': {
+            'user_id': user_id, 'document_hash': content_hash[:12],
+            'changed': len(changed), 'unchanged': len(unchanged),
+            'removed': len(removed)}})
+
+        for page in unchanged:
+            if previous_pages[page].get('no_text'):
+                continue
+            yield {'page_number': int(page), 'error': None, 'status': 'unchanged',
+                   'transactions': previous_pages[page].get('transactions', 0)}
+
+        seen = set()
+        if changed:
+            # Reserve one chunk per page; longer pages queue past the
+            # reservation instead of being rejected
+            with admission.reserve(user_id, len(changed)) as reservation:
+                # Read the retained copy: the upload under uploads/ is shared
+                # by name and may be replaced or deleted by other requests
+                for summary in stream_document(
+                        source_path, {page: boxes[page] for page in changed}, user_id,
+                        document_hash=content_hash, on_page_saved=record_page,
+                        admission=reservation, lease=lease, **pipeline_options):
+                    seen.add(str(summary['page_number']))
+                    if summary['error']:
+                        page_errors.append(
+                            f"page {summary['page_number']}: {summary['error']}")
+                    yield dict(summary, status='extracted')
+
+        # Changed pages whose boxes no longer capture any text lose their
+        # old rows and are recorded as done with nothing to extract. Pages
+        # whose extraction failed were yielded with an error, so they are
+        # in `seen` and keep their rows until a retry succeeds.
+        lease.renew()
+        for page in changed:
+            if page not in seen:
+                clear_page(page)
+                record_page(int(page), 0, 0, no_text=True)
+
+        for page in removed:
+            clear_page(page)
+            storage.remove_document_page(user_id, content_hash, int(page))
+            yield {'page_number': int(page), 'transactions': 0, 'error': None,
+                   'status': 'removed'}
+        finished = True
+    finally:
+        if sum(deleted_rows):
+            _invalidate_derived_data(user_id)
+
+        try:
+            lease.renew()
+        except DocumentBusy:
+            # The document's status and retained file now belong to the run
+            # that took it over
+            logger.warning("Document taken over by another run", extra={'fields': {
+                'user_id': user_id, 'document_hash': content_hash[:12]}})
+        else:
+            if finished and not page_errors:
+                storage.save_document(user_id, content_hash, status='complete',
+                                      file_path=None, error=None)
+                if os.path.exists(retained_path):
+                    os.remove(retained_path)
+            else:
+                error = '; '.join(page_errors) or 'Ingestion was interrupted'
+                storage.save_document(user_id, content_hash, status='incomplete',
+                                      error=error)
+                logger.warning("Document left incomplete", extra={'fields': {
+                    'user_id': user_id, 'document_hash': content_hash[:12],
+                    'failed_pages': len(page_errors)}})
+
+
+def retry_document(user_id: str, content_hash: str, **pipeline_options):
+    """Resume an incomplete document from its retained PDF and saved boxes.
+
+    Committed pages are skipped and chunks parsed by earlier attempts are
+    reused from their checkpoints, so only the remaining LLM work is done.
+    Yields the same page summaries as ingest_document.
+    """
+    document = storage.find_document(user_id, content_hash)
+    if document is None:
+        raise ValueError('Document not found')
+    file_path = document.get('file_path')
+    if not file_path or not os.path.exists(file_path):
+        raise ValueError('The source PDF is no longer available; submit it again')
+
+    logger.info("Retrying document", extra={'fields': {
+        'user_id': user_id, 'document_hash': content_hash[:12]}})
+    yield from ingest_document(file_path, document['filename'], document['boxes'],
+                               user_id, content_hash=content_hash,
+                               retain_file=False, **pipeline_options)
+
+
+def _invalidate_derived_data(user_id: str):
+    """Drop data derived from transactions that were just deleted"""
+    # Precomputed features only notice new rows, not deletions
+    storage.replace_features({user_id: []})
+    # The archive is append-only, so rebuild this user's files
+    if archive_available():
+        try:
+            backfill_archive(storage, [user_id])
+        except Exception as e:
+            logger.warning(f"Error rebuilding transaction archive: {str(e)}")
@@ -0,0 +1,176 @@
+"""Nightly recomputation of monthly finance features for every user.
+
+Walks all user IDs in the transactions collection, splits them into small
+partitions and runs FinanceProcessor for each partition in a process pool.
+Results are bulk-written to the monthly_features collection. Completed
+partitions are checkpointed so an interrupted run can be resumed with
+--resume RUN_ID.
+
+Usage (from ccc_python/):
+    python feature_job.py [--workers N] [--partition-size 50] [--resume RUN_ID]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from pymongo import MongoClient
+
+from config import Config
+from log_utils import setup_logging, get_logger, correlation_scope
+
+logger = get_logger(__name__)
+
+# Per-process storage handle, created by _init_worker
+_worker_storage = None
+
+
+def _init_worker(mongo_uri: str, database: str):
+    """Give every worker process its own MongoClient (clients are not fork-safe)"""
+    global _worker_storage
+    from storage import MongoStorage
+    setup_logging()
+    _worker_storage = MongoStorage(MongoClient(mongo_uri)[database])
+
+
+def _process_partition(user_ids: list, run_id: str) -> dict:
+    """Compute and store features for one partition of users"""
+    with correlation_scope(job_id=run_id):
+        return _compute_partition(user_ids)
+
+
+def _compute_partition(user_ids: list) -> dict:
+    from finance_processor import FinanceProcessor
+    from feature_store import write_feature_batch
+
+    # Take the timestamp before reading so rows saved during the run mark
+    # these features as stale
+    computed_at = datetime.now()
+
+    batch = {}
+    failed = []
+    transaction_count = 0
+    for user_id in user_ids:
+        try:
+            finance_features = FinanceProcessor.process_archived_transactions(
+                user_id, _worker_storage)
+            if finance_features is None:
+                transactions = _worker_storage.find_transaction_batch(
+                    user_id, FinanceProcessor.FEATURE_COLUMNS)
+                if not len(transactions):
+                    continue
+                transaction_count += len(transactions)
+                finance_features = FinanceProcessor.process_transactions(
+                    transactions)
+            batch[user_id] = finance_features
+        except Exception as e:
+            logger.exception(
+                f"Error computing features for user {user_id}: {str(e)}")
+            failed.append(user_id)
+
+    write_feature_batch(_worker_storage, batch, computed_at)
+    return {
+        'user_ids': user_ids,
+        'processed': len(batch),
+        'failed': failed,
+        'transactions': transaction_count
+    }
+
+
+def _partition(user_ids: list, size: int) -> list:
+    return [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+
+
+def run_feature_job(workers: int = None, partition_size: int = 50,
+                    run_id: str = None, mongo_uri: str = None,
+                    database: str = None) -> dict:
+    """Recompute features for all users and return a run summary"""
+    if Config.STORAGE_BACKEND != 'mongo':
+        raise ValueError('The feature job requires the mongo storage backend')
+    mongo_uri = mongo_uri or Config.MONGODB_URI
+    database = database or Config.MONGODB_DATABASE
+    workers = workers or os.cpu_count() or 1
+    run_id = run_id or uuid.uuid4().hex
+
+    with correlation_scope(job_id=run_id):
+        return _run_feature_job(workers, partition_size, run_id,
+                                mongo_uri, database)
+
+
+def _run_feature_job(workers: int, partition_size: int, run_id: str,
+                     mongo_uri: str, database: str) -> dict:
+    from storage import MongoStorage
+
+    db = MongoClient(mongo_uri)[database]
+    storage = MongoStorage(db)
+    checkpoints = db[Config.FEATURE_JOB_CHECKPOINTS_COLLECTION]
+    checkpoints.create_index([('run_id', 1), ('user_id', 1)], unique=True)
+
+    user_ids = storage.transaction_user_ids()
+    done = {doc['user_id'] for doc in checkpoints.find(
+        {'run_id': run_id}, {'user_id': 1})}
+    pending = [user_id for user_id in user_ids if user_id not in done]
+    partitions = _partition(pending, partition_size)
+
+    logger.info("Feature job started", extra={'fields': {
+        'users': len(user_ids), 'already_done': len(done),
+        'partitions': len(partitions), 'workers': workers}})
+
+    started = time.perf_counter()
+    summary = {'run_id': run_id, 'users': len(user_ids), 'processed': 0,
+               'skipped': len(done), 'failed': [], 'transactions': 0}
+
+    # spawn avoids inheriting the parent's MongoClient sockets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(mongo_uri, database)) as executor:
+        futures = [executor.submit(_process_partition, partition, run_id)
+                   for partition in partitions]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            summary['processed'] += result['processed']
+            summary['failed'].extend(result['failed'])
+            summary['transactions'] += result['transactions']
+
+            # Checkpoint the whole partition; failed users are retried on resume
+            finished = [user_id for user_id in result['user_ids']
+                        if user_id not in result['failed']]
+            if finished:
+                checkpoints.insert_many(
+                    [{'run_id': run_id, 'user_id': user_id,
+                      'completed_at': datetime.now()} for user_id in finished],
+                    ordered=False)
+
+            elapsed = time.perf_counter() - started
+            rate = summary['processed'] / elapsed if elapsed else 0.0
+            remaining = len(partitions) - completed
+            eta = remaining * elapsed / completed
+            logger.info("Feature job progress", extra={'fields': {
+                'partitions_done': completed, 'partitions': len(partitions),
+                'users_done': summary['processed'],
+                'users_per_second': round(rate, 1), 'eta_seconds': round(eta)}})
+
+    summary['elapsed_seconds'] = time.perf_counter() - started
+    logger.info("Feature job finished", extra={'fields': {
+        'users_done': summary['processed'], 'failed': len(summary['failed']),
+        'elapsed_seconds': round(summary['elapsed_seconds'], 1)}})
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: CPU count)')
+    parser.add_argument('--partition-size', type=int, default=50,
+                        help='users per partition')
+    parser.add_argument('--resume', dest='run_id', default=None,
+                        help='resume a previous run by ID')
+    args = parser.parse_args()
+    setup_logging()
+    run_feature_job(workers=args.workers, partition_size=args.partition_size,
+                    run_id=args.run_id)
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pandas as pd
+
+
+def features_to_documents(user_id: str, finance_features: pd.DataFrame,
+                          computed_at: datetime) -> list:
+    """Convert a FinanceProcessor result into one document per month"""
+    records = finance_features.assign(
+        month=finance_features['month'].astype(str)).to_dict(orient='records')
+    for record in records:
+        record['user_id'] = user_id
+        record['computed_at'] = computed_at
+    return records
+
+
+def write_user_features(storage, user_id: str,
+                        finance_features: pd.DataFrame,
+                        computed_at: datetime = None):
+    """Replace a user's monthly features with a single bulk write"""
+    return write_feature_batch(
+        storage, {user_id: finance_features}, computed_at)
+
+
+def write_feature_batch(storage, batch: dict, computed_at: datetime = None):
+    """Write features for many users in one round trip.
+
+    Args:
+        batch: mapping of user_id -> FinanceProcessor DataFrame
+    """
+    computed_at = computed_at or datetime.now()
+    return storage.replace_features({
+        user_id: features_to_documents(user_id, finance_features, computed_at)
+        for user_id, finance_features in batch.items()})
+
+
+def load_user_features(storage, user_id: str):
+    """Return precomputed features for a user, or None if missing or stale.
+
+    Features are considered stale when any transaction was saved after
+    they were computed.
+    """
+    documents = storage.find_features(user_id)
+    if not documents:
+        return None
+
+    computed_at = min(doc['computed_at'] for doc in documents)
+    latest = storage.latest_transaction_created_at(user_id)
+    if latest and latest > computed_at:
+        return None
+
+    finance_features = pd.DataFrame(documents).drop(columns=['computed_at'])
+    finance_features['month'] = pd.PeriodIndex(
+        finance_features['month'], freq='M')
+    return finance_features
@@ -1,11 +1,48 @@
+import numpy as np
 import pandas as pd
+from log_utils import get_logger
+from transaction_archive import (archive_available, archived_row_count,
+                                 load_archived_dataframe)
+from transaction_batch import TransactionBatch
+
+logger = get_logger(__name__)
 
 
 class FinanceProcessor:
+    # Columns required to compute the monthly features
+    FEATURE_COLUMNS = ['date', 'amount', 'prefix', 'category']
+    # Output of monthly_aggregates, one row per month
+    AGGREGATE_COLUMNS = ['month', 'monthly_income', 'monthly_expenses',
+                         'avg_transaction_amount', 'total_loan_payment',
+                         'num_loans_paid', 'credit_expenses']
+    # Output of process_transactions / features_from_aggregates
+    FEATURE_OUTPUT_COLUMNS = ['month', 'monthly_income', 'total_loan_payment',
+                              'num_loans_paid', 'dti_ratio', 'max_annual_dti',
+                              'monthly_expenses', 'savings_rate',
+                              'avg_transaction_amount', 'credit_expenses',
+                              'credit_utilization']
+
+    @staticmethod
+    def process_transactions(transactions) -> pd.DataFrame:
+        return FinanceProcessor.features_from_aggregates(
+            FinanceProcessor.monthly_aggregates(transactions))
+
     @staticmethod
-    def process_transactions(transactions: list) -> pd.DataFrame:
+    def monthly_aggregates(transactions) -> pd.DataFrame:
+        """Per-month sums and counts the finance features are derived from.
+
+        transactions may be a TransactionBatch, a DataFrame or a list of
+        documents.
+        """
         # Convert transactions to DataFrame
-        df = pd.DataFrame([t for t in transactions])
+        if isinstance(transactions, TransactionBatch):
+            df = transactions.to_frame(FinanceProcessor.FEATURE_COLUMNS)
+        elif isinstance(transactions, pd.DataFrame):
+            df = transactions.copy(deep=False)
+        else:
+            df = pd.DataFrame([t for t in transactions])
+        if df.empty:
+            return pd.DataFrame(columns=FinanceProcessor.AGGREGATE_COLUMNS)
 
         # Convert date column to datetime with error handling
         try:
@@ -21,87 +58,90 @@ class FinanceProcessor:
         except Exception as e:
             raise e
 
+        return FinanceProcessor._aggregate_months(df)
+
+    @staticmethod
+    def _aggregate_months(df: pd.DataFrame) -> pd.DataFrame:
         # Adjust income and expenses based on prefix and category
-        df["income"] = df.apply(
-            lambda x: x["amount"] if x["prefix"] == 1 and x["category"] in [
-                "income", "financial"] else 0,
-            axis=1
-        )
-        df["expense"] = df.apply(
-            lambda x: x["amount"] if x["prefix"] == -1 else 0,
-            axis=1
-        )
-
-        # Compute total monthly income
-        monthly_income = df.groupby(["month"])["income"].sum().reset_index()
-        monthly_income.rename(
-            columns={"income": "monthly_income"}, inplace=True)
-
-        # Compute total monthly expenses
-        monthly_expenses = df.groupby(["month"])["expense"].sum().reset_index()
-        monthly_expenses.rename(
-            columns={"expense": "monthly_expenses"}, inplace=True)
-        monthly_expenses["monthly_expenses"] = monthly_expenses["monthly_expenses"].abs(
-        )
-
-        # Compute average transaction amount
-        avg_transaction = df.groupby(
-            ["month"])["amount"].mean().abs().reset_index()
-        avg_transaction.rename(
-            columns={"amount": "avg_transaction_amount"}, inplace=True)
-
-        # Compute loan-related metrics
-        loan_df = df[(df["category"] == "Financial") & (df["prefix"] == -1)]
-        loan_payments = loan_df.groupby(["month"])["expense"].agg([
-            ("total_loan_payment", lambda x: abs(sum(x))),
-            ("num_loans_paid", "count")
-        ]).reset_index()
-
-        # Compute credit card expenses and utilization
-        credit_expenses = df[
+        df["income"] = df["amount"].where(
+            (df["prefix"] == 1) & df["category"].isin(["income", "financial"]), 0)
+        df["expense"] = df["amount"].where(df["prefix"] == -1, 0)
+
+        monthly = df.groupby("month")
+        aggregates = pd.DataFrame({
+            "monthly_income": monthly["income"].sum(),
+            "monthly_expenses": monthly["expense"].sum().abs(),
+            "avg_transaction_amount": monthly["amount"].mean().abs()
+        })
+
+        # Loan-related metrics
+        loans = df[(df["category"] == "Financial") &
+                   (df["prefix"] == -1)].groupby("month")["expense"]
+        aggregates["total_loan_payment"] = loans.sum().abs()
+        aggregates["num_loans_paid"] = loans.count()
+
+        # Credit card expenses
+        aggregates["credit_expenses"] = df[
             (df["category"].isin(["Shopping", "Entertainment", "Food"])) &
             (df["prefix"] == -1)
-        ].groupby(["month"])["amount"].sum().abs().reset_index()
-        credit_expenses.rename(
-            columns={"amount": "credit_expenses"}, inplace=True)
+        ].groupby("month")["amount"].sum().abs()
 
-        # Note: Total credit limit should be provided as input for accurate calculation
-        # Using a placeholder value of 10000 for demonstration
-        credit_limit = 10000
-        credit_expenses["credit_utilization"] = credit_expenses["credit_expenses"] / credit_limit
+        return aggregates.fillna(0).reset_index()[FinanceProcessor.AGGREGATE_COLUMNS]
+
+    @staticmethod
+    def features_from_aggregates(aggregates: pd.DataFrame) -> pd.DataFrame:
+        """Derive the finance features from monthly_aggregates output.
+
+        The aggregates may come from pandas or from the storage backend's
+        SQL, so this only needs one row per month sorted by month.
+        """
+        features = aggregates.sort_values("month").reset_index(drop=True)
 
-        # Compute Debt-to-Income Ratio (DTI)
-        dti = pd.merge(monthly_income, loan_payments,
-                       on="month", how="left").fillna(0)
         # Ensure DTI ratio is between 0 and 1, handling zero monthly income
-        dti["dti_ratio"] = dti.apply(
-            lambda x: min(1, x["total_loan_payment"] /
-                          max(x["monthly_income"], 0.01)),
-            axis=1
-        )
+        features["dti_ratio"] = np.minimum(
+            1, features["total_loan_payment"] /
+            np.maximum(features["monthly_income"], 0.01))
 
         # Calculate max DTI ratio over 1-year interval
-        dti["max_annual_dti"] = dti["dti_ratio"].rolling(
+        features["max_annual_dti"] = features["dti_ratio"].rolling(
             window=12, min_periods=1).max()
 
-        # Compute Savings Rate
-        savings = pd.merge(monthly_income, monthly_expenses,
-                           on="month", how="left").fillna(0)
-
         # Ensure savings rate is between 0 and 1
-        savings["savings_rate"] = savings.apply(
-            lambda x: max(0, min(
-                1, (x["monthly_income"] - x["monthly_expenses"]) / max(x["monthly_income"], 0.01))),
-            axis=1
-        )
-
-        # Merge all financial variables
-        finance_features = dti.merge(savings.drop(
-            columns=['monthly_income']), on="month", how="left")
-        finance_features = finance_features.merge(
-            avg_transaction, on="month", how="left")
-        finance_features = finance_features.merge(
-            credit_expenses, on="month", how="left")
-        finance_features = finance_features.fillna(0)
-
-        return finance_features
+        features["savings_rate"] = (
+            (features["monthly_income"] - features["monthly_expenses"]) /
+            np.maximum(features["monthly_income"], 0.01)).clip(0, 1)
+
+        # Note: Total credit limit should be provided as input for accurate calculation
+        # Using a placeholder value of 10000 for demonstration
+        credit_limit = 10000
+        features["credit_utilization"] = features["credit_expenses"] / credit_limit
+
+        return features[FinanceProcessor.FEATURE_OUTPUT_COLUMNS]
+
+    @staticmethod
+    def process_archived_transactions(user_id: str, storage):
+        """Compute features from the user's columnar archive.
+
+        Only the feature columns are memory-mapped. The archive can lag the
+        storage backend (it was enabled without a backfill, or a mirror write
+        failed), so it is only used when it holds exactly as many rows as
+        storage does for the user. Returns None otherwise, or when the
+        archive is disabled, so callers can fall back to the storage backend.
+        """
+        if not archive_available():
+            return None
+        archived = archived_row_count(user_id)
+        if not archived:
+            return None
+        stored = storage.count_transactions(user_id)
+        if archived != stored:
+            logger.warning("Archive out of sync with storage; not using it",
+                           extra={'fields': {'user_id': user_id,
+                                             'archived': archived,
+                                             'stored': stored}})
+            return None
+        df = load_archived_dataframe(
+            user_id, columns=FinanceProcessor.FEATURE_COLUMNS)
+        if df is None or df.empty:
+            return None
+        return FinanceProcessor.process_transactions(df)
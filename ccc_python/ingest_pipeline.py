@@ -0,0 +1,199 @@
+import contextvars
+import queue
+import threading
+
+from admission import AdmissionRejected
+from config import Config
+from log_utils import get_logger
+from pdf_processor import iter_pdf_pages
+from transaction_batch import TransactionBatch
+from transaction_processor import (ChunkCheckpoints, DocumentBusy, iter_parsed_chunks,
+                                   save_transaction_batch, save_page_transactions)
+
+logger = get_logger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _StageFailed(Exception):
+    """Wraps an exception raised inside a background stage"""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def _start_stage(target, *args) -> threading.Thread:
+    # Run the stage in a copy of the caller's context so logs keep the
+    # request/job correlation IDs
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(target, *args),
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def _extract_pages(filepath: str, boxes: dict, pages: queue.Queue,
+                   stop: threading.Event):
+    """Stage 1: pdfplumber page text, one page at a time"""
+    try:
+        for page_data in iter_pdf_pages(filepath, boxes):
+            if not _put(pages, page_data, stop):
+                return
+        _put(pages, _DONE, stop)
+    except Exception as e:
+        _put(pages, _StageFailed(e), stop)
+
+
+def _write_batches(batches: queue.Queue, on_page_saved, lease,
+                   failed: threading.Event, errors: list):
+    """Stage 3: bulk inserts of parsed transaction batches.
+
+    Items are (page_number, TransactionBatch); page_number is None for plain
+    appends, otherwise the page's previous rows are replaced once the lease
+    (if any) is confirmed to still be held.
+    """
+    while True:
+        item = batches.get()
+        if item is _DONE:
+            return
+        page_number, batch = item
+        try:
+            if page_number is None:
+                save_transaction_batch(batch)
+            else:
+                if lease is not None:
+                    lease.renew()
+                saved_ids, deleted = save_page_transactions(batch, page_number)
+                if on_page_saved is not None:
+                    on_page_saved(page_number, len(saved_ids), deleted)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+            return
+
+
+def stream_document(filepath: str, boxes: dict, user_id: str,
+                    page_buffer: int = None, write_batch_size: int = None,
+                    write_buffer: int = None, document_hash: str = None,
+                    on_page_saved=None, admission=None, lease=None):
+    """Stream one statement through extraction, parsing and DB writes.
+
+    Pages are extracted on a background thread into a bounded queue, parsed
+    chunk by chunk on the calling thread, and parsed rows are bulk-inserted
+    by a writer thread in batches of `write_batch_size`. Full queues block
+    the upstream stage, so at most a few pages and batches are held in
+    memory regardless of statement length. Rows already parsed are still
+    written if the caller stops early or parsing is rejected.
+
+    With a document_hash, rows are tagged with their page and written one
+    page at a time, atomically replacing the rows from that page's previous
+    extraction; a page that fails to extract or parse keeps its previous
+    rows, and its already parsed chunks are checkpointed so a retry skips
+    them.
+    on_page_saved(page_number, saved, deleted) is called from the writer
+    thread after each page is committed. A DocumentLease is renewed on every
+    chunk checkpoint and before every page commit; if another run has taken
+    the document over, DocumentBusy stops the stream.
+
+    LLM calls are admitted by `admission` (an AdmissionController or a
+    Reservation), the shared admission_controller by default.
+
+    Yields a small summary per page as soon as it has been parsed:
+        {'page_number': int, 'transactions': int, 'error': str | None}
+    """
+    page_buffer = page_buffer or Config.PIPELINE_PAGE_BUFFER
+    write_batch_size = write_batch_size or Config.PIPELINE_WRITE_BATCH_SIZE
+    write_buffer = write_buffer or Config.PIPELINE_WRITE_BUFFER
+
+    stop = threading.Event()
+    write_failed = threading.Event()
+    write_errors = []
+    pages = queue.Queue(maxsize=page_buffer)
+    batches = queue.Queue(maxsize=write_buffer)
+
+    extractor = _start_stage(_extract_pages, filepath, boxes, pages, stop)
+    writer = _start_stage(_write_batches, batches, on_page_saved, lease,
+                          write_failed, write_errors)
+
+    # Parsed chunks are kept as TransactionBatch arrays, not per-row dicts
+    pending, pending_rows = [], 0
+    try:
+        while not write_failed.is_set():
+            page_data = _get(pages, stop)
+            if page_data is _DONE:
+                break
+            if isinstance(page_data, _StageFailed):
+                raise page_data.error
+
+            page_number = page_data['page_number']
+            summary = {'page_number': page_number, 'transactions': 0,
+                       'error': page_data.get('error')}
+            if summary['error'] is not None:
+                # Extraction failed; nothing is written, so with a
+                # document_hash the page keeps its previous rows
+                yield summary
+                continue
+            page_batches = []
+            try:
+                checkpoints = None
+                if document_hash is not None:
+                    checkpoints = ChunkCheckpoints(user_id, document_hash, page_number,
+                                                   lease)
+                for chunk_result in iter_parsed_chunks(page_data['text'], user_id,
+                                                       checkpoints, admission):
+                    batch = TransactionBatch.from_transactions(
+                        chunk_result.Transactions, user_id, document_hash,
+                        page_number if document_hash is not None else None)
+                    summary['transactions'] += len(batch)
+                    if document_hash is not None:
+                        page_batches.append(batch)
+                        continue
+                    pending.append(batch)
+                    pending_rows += len(batch)
+                    if pending_rows >= write_batch_size:
+                        _put(batches, (None, TransactionBatch.concat(pending)),
+                             write_failed)
+                        pending, pending_rows = [], 0
+                if document_hash is not None:
+                    page_batch = TransactionBatch.concat(
+                        page_batches or [TransactionBatch.empty(user_id, document_hash)])
+                    _put(batches, (page_number, page_batch), write_failed)
+            except (AdmissionRejected, DocumentBusy):
+                raise
+            except Exception as e:
+                logger.error(f"Error processing page {page_number}: {str(e)}")
+                summary['error'] = str(e)
+
+            yield summary
+    finally:
+        stop.set()
+        if pending:
+            _put(batches, (None, TransactionBatch.concat(pending)), write_failed)
+        _put(batches, _DONE, write_failed)
+        writer.join()
+        extractor.join()
+
+    if write_errors:
+        raise write_errors[0]
@@ -0,0 +1,71 @@
+import hashlib
+import re
+from datetime import datetime
+
+import pdfplumber
+
+from config import Config
+from db import storage
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def _normalize_header(text: str) -> str:
+    # Dates, balances and account numbers change between statements of the
+    # same layout, so only the non-numeric words identify it
+    text = re.sub(r'[\d.,/:$-]+', ' ', text or '')
+    return ' '.join(text.lower().split())
+
+
+def compute_fingerprint(filepath: str) -> str:
+    """Cheap layout fingerprint: first page size plus a hash of its header text"""
+    with pdfplumber.open(filepath) as pdf:
+        page = pdf.pages[0]
+        width, height = round(float(page.width)), round(float(page.height))
+        header = page.crop((0, 0, page.width,
+                            page.height * Config.TEMPLATE_HEADER_FRACTION))
+        header_text = _normalize_header(header.extract_text())
+        page.flush_cache()
+
+    header_hash = hashlib.sha1(header_text.encode('utf-8')).hexdigest()[:16]
+    return f"{width}x{height}:{header_hash}"
+
+
+def save_template(user_id: str, name: str, boxes: dict, fingerprint: str) -> dict:
+    """Create or replace a named template holding processed boxes per page"""
+    if not name:
+        raise ValueError('Template name is required')
+    if not boxes:
+        raise ValueError('Template boxes are required')
+
+    template = {
+        'user_id': user_id,
+        'name': name,
+        'fingerprint': fingerprint,
+        'boxes': boxes,
+        'updated_at': datetime.now()
+    }
+    storage.save_template(template)
+    logger.info("Saved layout template", extra={'fields': {
+        'user_id': user_id, 'template': name, 'fingerprint': fingerprint}})
+    return template
+
+
+def get_template(user_id: str, name: str) -> dict:
+    template = storage.find_template(user_id, name)
+    if not template:
+        raise ValueError(f'Template {name} not found')
+    return template
+
+
+def match_template(user_id: str, fingerprint: str):
+    """Return the most recently updated template with this fingerprint, if any"""
+    return storage.find_template_by_fingerprint(user_id, fingerprint)
+
+
+def list_templates(user_id: str) -> list:
+    templates = storage.list_templates(user_id)
+    for template in templates:
+        template['updated_at'] = template['updated_at'].isoformat()
+    return templates
@@ -0,0 +1,239 @@
+"""Read-path load test for the dashboard and loan endpoints.
+
+Seeds a local MongoDB database, trains stub loan models, starts the Flask
+server against them and drives a mix of GET /api/transactions and
+POST /api/loan/apply at increasing concurrency. For every level it reports
+latency percentiles, throughput, errors and the server's CPU and RSS, and
+writes the results to JSON and CSV so runs can be compared.
+
+Usage (from ccc_python/, with MongoDB running locally):
+    python loadtest/run_loadtest.py --users 200 --transactions 2000 \\
+        --concurrency 1 4 16 32 --duration 20
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed import DEFAULT_DATABASE, seed, user_id_for  # noqa: E402
+from stub_models import train_stub_models  # noqa: E402
+
+try:
+    import psutil
+except ImportError:  # fall back to /proc on Linux
+    psutil = None
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', '')
+
+
+class ProcessSampler(threading.Thread):
+    """Samples a process's CPU utilisation and RSS at a fixed interval"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if psutil is None else None
+
+    def _cpu_seconds(self) -> float:
+        if psutil is not None:
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._clock_ticks
+
+    def _rss_mb(self) -> float:
+        if psutil is not None:
+            return psutil.Process(self.pid).memory_info().rss / 2**20
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def run(self):
+        last_cpu, last_time = self._cpu_seconds(), time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            cpu, now = self._cpu_seconds(), time.perf_counter()
+            self.samples.append({
+                'cpu_percent': 100 * (cpu - last_cpu) / (now - last_time),
+                'rss_mb': self._rss_mb()
+            })
+            last_cpu, last_time = cpu, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def start_server(port: int, database: str, mongo_uri: str) -> subprocess.Popen:
+    env = dict(os.environ, MONGODB_URI=mongo_uri, MONGODB_DATABASE=database,
+               MODEL_PATH=MODELS_DIR)
+    process = subprocess.Popen(
+        [sys.executable, '-c',
+         f"import server; server.app.run(port={port}, threaded=True, debug=False)"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/admission/metrics')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('Server exited during startup')
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError('Server did not start within 60 seconds')
+
+
+def client_worker(port: int, users: int, loan_share: float, deadline: float,
+                  results: list, seed_value: int):
+    rng = random.Random(seed_value)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.perf_counter() < deadline:
+        user_id = user_id_for(rng.randrange(users))
+        if rng.random() < loan_share:
+            endpoint = 'loan'
+            body = json.dumps({'user_id': user_id, 'age': rng.randint(21, 70),
+                               'credit_score': rng.randint(550, 820),
+                               'term': 360, 'loan_amount': rng.randint(5, 500) * 1000})
+            method, path = 'POST', '/api/loan/apply'
+            headers = {'Content-Type': 'application/json'}
+        else:
+            endpoint = 'transactions'
+            body = None
+            method, path = 'GET', f'/api/transactions?user_id={user_id}'
+            headers = {}
+
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        results.append((endpoint, time.perf_counter() - started, status))
+    connection.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(concurrency: int, duration: float, results: list,
+              samples: list) -> dict:
+    summary = {'concurrency': concurrency,
+               'requests': len(results),
+               'throughput_rps': len(results) / duration,
+               'error_rate': (sum(1 for _, _, status in results if status != 200)
+                              / len(results)) if results else 0.0,
+               'cpu_percent_avg': (sum(s['cpu_percent'] for s in samples) / len(samples)
+                                   if samples else 0.0),
+               'cpu_percent_max': max((s['cpu_percent'] for s in samples), default=0.0),
+               'rss_mb_max': max((s['rss_mb'] for s in samples), default=0.0)}
+    for endpoint in ('all', 'transactions', 'loan'):
+        latencies = [latency for name, latency, _ in results
+                     if endpoint == 'all' or name == endpoint]
+        for label, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+            summary[f'{endpoint}_{label}_ms'] = percentile(latencies, fraction) * 1000
+    return summary
+
+
+def run_level(port: int, pid: int, concurrency: int, duration: float,
+              users: int, loan_share: float) -> dict:
+    results = []
+    sampler = ProcessSampler(pid)
+    sampler.start()
+    deadline = time.perf_counter() + duration
+    workers = [threading.Thread(target=client_worker,
+                                args=(port, users, loan_share, deadline, results, i))
+               for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    sampler.stop()
+    return summarize(concurrency, duration, results, sampler.samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=1000,
+                        help='transactions per user')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='reuse the data from a previous run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--duration', type=float, default=20,
+                        help='seconds per concurrency level')
+    parser.add_argument('--loan-share', type=float, default=0.2,
+                        help='fraction of requests hitting /api/loan/apply')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', default=os.path.join('loadtest', 'results'))
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(MODELS_DIR, 'classification_model.pkl')):
+        train_stub_models(MODELS_DIR)
+    if not args.skip_seed:
+        total = seed(args.mongo_uri, args.database, args.users,
+                     args.transactions, args.months)
+        print(f"Seeded {total} transactions for {args.users} users", flush=True)
+
+    server = start_server(args.port, args.database, args.mongo_uri)
+    levels = []
+    try:
+        print(f"{'conc':>5}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+              f"{'errors':>8}{'cpu %':>8}{'rss MB':>9}", flush=True)
+        for concurrency in args.concurrency:
+            level = run_level(args.port, server.pid, concurrency, args.duration,
+                              args.users, args.loan_share)
+            levels.append(level)
+            print(f"{concurrency:>5}{level['throughput_rps']:>9.1f}"
+                  f"{level['all_p50_ms']:>9.1f}{level['all_p90_ms']:>9.1f}"
+                  f"{level['all_p99_ms']:>9.1f}{level['error_rate']:>8.1%}"
+                  f"{level['cpu_percent_avg']:>8.0f}{level['rss_mb_max']:>9.0f}",
+                  flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    os.makedirs(args.output, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    report = {'parameters': vars(args), 'levels': levels}
+    with open(os.path.join(args.output, f'loadtest-{stamp}.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(args.output, f'loadtest-{stamp}.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(levels[0].keys()))
+        writer.writeheader()
+        writer.writerows(levels)
+    print(f"Results written to {args.output}/loadtest-{stamp}.json and .csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Seed a local MongoDB database with synthetic users and transactions.
+
+Each user gets `--transactions` rows spread over `--months` months, with a
+monthly salary, loan payments and everyday spending so the finance features
+and loan endpoint have realistic inputs.
+
+Usage (from ccc_python/):
+    python loadtest/seed.py --users 200 --transactions 2000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+DEFAULT_DATABASE = 'pdf_processor_loadtest'
+SPENDING = [('Food', 5, 120), ('Shopping', 10, 400), ('Transportation', 3, 80),
+            ('Bills', 20, 250), ('Entertainment', 5, 90), ('Health', 10, 300),
+            ('Housing', 500, 2500)]
+
+
+def user_id_for(index: int) -> str:
+    return f"loadtest-user-{index:05d}"
+
+
+def user_transactions(user_id: str, count: int, months: int, rng: random.Random):
+    end = datetime(2024, 12, 31)
+    start = end - timedelta(days=30 * months)
+    salary = round(rng.uniform(2500, 12000), 2)
+    loan_payment = round(salary * rng.uniform(0.05, 0.45), 2)
+    now = datetime.now()
+
+    rows = []
+    for month in range(months):
+        month_start = start + timedelta(days=30 * month)
+        rows.append((month_start + timedelta(days=1), 'Payroll deposit', 1,
+                     salary, 'income'))
+        rows.append((month_start + timedelta(days=5), 'Loan payment', -1,
+                     loan_payment, 'Financial'))
+    while len(rows) < count:
+        category, low, high = rng.choice(SPENDING)
+        rows.append((start + timedelta(days=rng.uniform(0, 30 * months)),
+                     f"{category} merchant {rng.randint(1, 300)}", -1,
+                     round(rng.uniform(low, high), 2), category))
+
+    for date, description, prefix, amount, category in rows[:count]:
+        yield {'date': date, 'description': description, 'prefix': prefix,
+               'amount': amount, 'category': category, 'user_id': user_id,
+               'created_at': now}
+
+
+def seed(mongo_uri: str, database: str, users: int, transactions: int,
+         months: int, seed_value: int = 42):
+    collection = MongoClient(mongo_uri)[database]['transactions']
+    collection.drop()
+    collection.create_index([('user_id', 1), ('created_at', -1)])
+
+    rng = random.Random(seed_value)
+    for index in range(users):
+        user_id = user_id_for(index)
+        collection.insert_many(
+            list(user_transactions(user_id, transactions, months, rng)),
+            ordered=False)
+    return collection.count_documents({})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=1000,
+                        help='transactions per user')
+    parser.add_argument('--months', type=int, default=24)
+    args = parser.parse_args()
+
+    total = seed(args.mongo_uri, args.database, args.users,
+                 args.transactions, args.months)
+    print(f"Seeded {total} transactions for {args.users} users into {args.database}")
@@ -0,0 +1,53 @@
+"""Train tiny XGBoost stand-ins for the loan approval and APR models.
+
+The real model files are not part of the repository; these stubs have the
+same feature columns and file names so /api/loan/apply runs end to end.
+
+Usage (from ccc_python/):
+    python loadtest/stub_models.py --output loadtest/models/
+"""
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier, XGBRegressor
+
+FEATURES = ['age', 'Credit_Score', 'income', 'term', 'loan_amount', 'dtir1']
+
+
+def synthetic_applications(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.uniform(21, 75, rows),
+        'Credit_Score': rng.uniform(500, 850, rows),
+        'income': rng.uniform(15000, 250000, rows),
+        'term': rng.choice([120, 180, 240, 360], rows).astype(float),
+        'loan_amount': rng.uniform(5000, 800000, rows),
+        'dtir1': rng.uniform(0, 1, rows)
+    })[FEATURES]
+
+
+def train_stub_models(output: str, rows: int = 2000):
+    data = synthetic_applications(rows)
+    approved = ((data['Credit_Score'] > 650) & (data['dtir1'] < 0.45)).astype(int)
+    apr = (3 + (850 - data['Credit_Score']) / 50 + data['dtir1'] * 4).round(2)
+
+    classifier = XGBClassifier(n_estimators=20, max_depth=3)
+    classifier.fit(data, approved)
+    regressor = XGBRegressor(n_estimators=20, max_depth=3)
+    regressor.fit(data, apr)
+
+    os.makedirs(output, exist_ok=True)
+    joblib.dump(classifier, os.path.join(output, 'classification_model.pkl'))
+    joblib.dump(regressor, os.path.join(output, 'regression_model.pkl'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=os.path.join('loadtest', 'models', ''))
+    args = parser.parse_args()
+    train_stub_models(args.output)
+    print(f"Wrote stub models to {args.output}")
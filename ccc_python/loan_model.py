@@ -1,15 +1,19 @@
 import pandas as pd
 import joblib
 import warnings
+from config import Config
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # Filter XGBoost version compatibility warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='xgboost.core')
 
 
 class LoanModel:
-    def __init__(self, model_path='models/'):
+    def __init__(self, model_path=None):
         """Initialize LoanModel with path to model files."""
-        self.model_path = model_path
+        self.model_path = model_path or Config.MODEL_PATH
         self.approval_model = None
         self.apr_model = None
         self.load_models()
@@ -55,7 +59,8 @@ class LoanModel:
 
         # Predict APR rate
         apr_rate = self.apr_model.predict(data)[0]
-        print("approved: ", approval_prob, ", APR: ", apr_rate)
+        logger.info("Loan prediction", extra={'fields': {
+            'approved': approval_prob, 'apr': float(apr_rate)}})
         return approval_prob, apr_rate
 
 
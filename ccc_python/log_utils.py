@@ -0,0 +1,171 @@
+import atexit
+import contextvars
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import Config
+
+# Correlation IDs attached to every record logged in the current context
+request_id_var = contextvars.ContextVar('request_id', default=None)
+job_id_var = contextvars.ContextVar('job_id', default=None)
+
+_listener = None
+_setup_lock = threading.Lock()
+_sample_counters = {}
+
+
+class CorrelationFilter(logging.Filter):
+    """Copy the current request and job IDs onto each record"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.job_id = job_id_var.get()
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge args and render tracebacks here; full JSON formatting
+        # is left to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _BlockingSentinelListener(logging.handlers.QueueListener):
+    """Wait for room in a full queue when stopping instead of raising"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        job_id = getattr(record, 'job_id', None)
+        if job_id:
+            entry['job_id'] = job_id
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level: str = None, stream=None):
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only pay for enqueueing a record; formatting and the blocking
+    write to stdout happen on the listener thread. Safe to call more than
+    once per process.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+
+        # Bounded so a stalled stdout cannot grow memory without limit
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(log_queue)
+        # Resolve correlation IDs on the calling thread, not the listener
+        queue_handler.addFilter(CorrelationFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(level or Config.LOG_LEVEL)
+
+        _listener = _BlockingSentinelListener(
+            log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def dropped_records() -> int:
+    """Number of records dropped because the log queue was full"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _DroppingQueueHandler):
+            return handler.dropped
+    return 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+@contextmanager
+def correlation_scope(request_id: str = None, job_id: str = None):
+    """Attach request and/or job IDs to records logged inside the block"""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def sampled(key: str, every: int = None) -> bool:
+    """Return True for one in `every` calls with the same key.
+
+    Used to thin out per-row events, e.g.
+    `if sampled('save_transactions'): logger.debug(...)`.
+    """
+    every = every or Config.LOG_SAMPLE_EVERY
+    if every <= 1:
+        return True
+    counter = _sample_counters.get(key)
+    if counter is None:
+        counter = _sample_counters.setdefault(key, itertools.count())
+    return next(counter) % every == 0
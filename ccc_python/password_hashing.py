@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from config import Config
+
+
+class AuthBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# PBKDF2 releases the GIL, so a small dedicated pool bounds how many cores a
+# login storm can take without blocking other request threads on the GIL
+_hash_executor = ThreadPoolExecutor(max_workers=Config.AUTH_HASH_WORKERS,
+                                    thread_name_prefix='auth-hash')
+# Caps hashes running + waiting; beyond that callers are turned away
+_hash_slots = threading.BoundedSemaphore(Config.AUTH_HASH_MAX_PENDING)
+
+
+def _run_hash_task(fn, *args):
+    """Run a hashing call on the auth executor, honouring the pending cap.
+
+    A full queue is rejected at once; the request thread never waits for a
+    slot.
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise AuthBusy('Too many concurrent sign-ins, please retry',
+                       Config.AUTH_RETRY_AFTER_SECONDS)
+    try:
+        return _hash_executor.submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+def hash_password(password: str) -> str:
+    """Hash a password using pbkdf2:sha256 on the auth executor"""
+    return _run_hash_task(generate_password_hash, password,
+                          'pbkdf2:sha256', 16)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against its hash on the auth executor"""
+    return _run_hash_task(check_password_hash, password_hash, password)
@@ -3,40 +3,69 @@ import os
 import sys
 from datetime import datetime
 from db import db
+from log_utils import get_logger
+from char_index import PageCharIndex
+
+logger = get_logger(__name__)
 
 
 def process_pdf_with_pdfplumber(filepath, boxes):
     """Process PDF with pdfplumber using the provided boxes coordinates"""
+    results = [page for page in iter_pdf_pages(filepath, boxes)
+               if page.get('error') is None]
+    if not results:
+        raise ValueError("No text was successfully extracted from the PDF")
+
+    return results
+
+
+def _page_error(filepath, page_num, error):
+    try:
+        page_num = int(page_num)
+    except ValueError:
+        pass
+    return {"text": None, "page_number": page_num, "file_path": filepath,
+            "error": str(error)}
+
+
+def iter_pdf_pages(filepath, boxes):
+    """Yield extracted text page by page, releasing each page's caches.
+
+    A page whose extraction fails (e.g. a box outside the page) is yielded
+    with text None and an 'error' message instead of being skipped, so
+    callers can tell it apart from a page that has no text in its boxes.
+    """
     if not boxes:
         raise ValueError("No boxes provided for processing")
 
-    results = []
-    for page_num in boxes:
-        if not boxes[page_num]:
-            continue
-
-        try:
-            # Convert page number to zero-based index
-            page_index = int(page_num) - 1
-            # Convert target areas to list of tuples
-            target_areas = [tuple(map(float, area.split(',')))
-                            for area in boxes[page_num]]
-            print(f"""Processing page {
-                  page_num} with target areas: {target_areas}""")
-
-            with pdfplumber.open(filepath) as pdf:
+    with pdfplumber.open(filepath) as pdf:
+        for page_num in boxes:
+            if not boxes[page_num]:
+                continue
+
+            try:
+                # Convert page number to zero-based index
+                page_index = int(page_num) - 1
+                # Convert target areas to list of tuples
+                target_areas = [tuple(map(float, area.split(',')))
+                                for area in boxes[page_num]]
+                logger.debug("Processing page", extra={'fields': {
+                    'page': page_num, 'boxes': len(target_areas)}})
+
                 if page_index < 0 or page_index >= len(pdf.pages):
-                    print(f"Invalid page number {page_num}")
+                    logger.warning(f"Invalid page number {page_num}")
                     continue
 
                 page = pdf.pages[page_index]
-                # Process each box area individually
+                # Index the page's chars once and answer every box from it
+                char_index = PageCharIndex(page)
                 page_texts = []
                 for bbox in target_areas:
-                    text = page.within_bbox(bbox).extract_text(
-                        layout=True, y_density=9, x_density=9)
+                    text = char_index.extract_text(
+                        bbox, layout=True, y_density=9, x_density=9)
                     if text:
                         page_texts.append(text.strip())
+                page.flush_cache()
 
                 if page_texts:
                     text = '\n'.join(page_texts)
@@ -46,16 +75,12 @@ def process_pdf_with_pdfplumber(filepath, boxes):
                         "page_number": int(page_num),
                         "file_path": filepath
                     }
-                    results.append(result_doc)
-
-        except (KeyError, IndexError) as e:
-            print(f"Error processing page {page_num}: {str(e)}")
-            continue
-        except Exception as e:
-            print(f"Unexpected error processing page {page_num}: {str(e)}")
-            continue
+                    yield result_doc
 
-    if not results:
-        raise ValueError("No text was successfully extracted from the PDF")
-
-    return results
+            except (KeyError, IndexError) as e:
+                logger.error(f"Error processing page {page_num}: {str(e)}")
+                yield _page_error(filepath, page_num, e)
+            except Exception as e:
+                logger.exception(
+                    f"Unexpected error processing page {page_num}: {str(e)}")
+                yield _page_error(filepath, page_num, e)
@@ -0,0 +1,138 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; falls back to the json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Convert types the JSON encoder doesn't handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        # Covers pandas Timestamps, which orjson hands to default
+        return obj.isoformat()
+    if isinstance(obj, pd.Period):
+        return str(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if obj is pd.NaT:
+        return None
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj) -> bytes:
+    """Encode obj as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify and request.json"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the bytes -> str -> bytes round trip of the base class
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
+
+
+def _column_values(series: pd.Series, as_list: bool):
+    """JSON-ready values for one column, converted for the whole column at once"""
+    if isinstance(series.dtype, pd.PeriodDtype):
+        return series.astype(str).tolist()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.astype(object).where(series.notna(), None)
+        return [value.isoformat() if value is not None else None for value in values]
+    if pd.api.types.is_numeric_dtype(series.dtype) and not as_list:
+        # orjson writes contiguous numeric arrays natively (NaN -> null)
+        return np.ascontiguousarray(series.to_numpy())
+    return series.tolist()
+
+
+def frame_columns(df: pd.DataFrame) -> dict:
+    """Column-oriented payload: {column: [values...]}"""
+    return {str(name): _column_values(df[name], as_list=False) for name in df.columns}
+
+
+def frame_records(df: pd.DataFrame) -> list:
+    """Row-oriented payload, equivalent to to_dict(orient='records').
+
+    Each column is converted once and the rows are zipped together, instead
+    of converting every cell through pandas.
+    """
+    names = [str(name) for name in df.columns]
+    columns = [_column_values(df[name], as_list=True) for name in df.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _negotiate_encoding(accept_encodings) -> str:
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offered)
+
+
+def compress_response(response, accept_encodings):
+    """Compress a JSON response body with brotli or gzip if the client accepts it.
+
+    Small, streamed and already-encoded responses are left untouched.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < Config.RESPONSE_COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = _negotiate_encoding(accept_encodings)
+    if encoding == 'br':
+        body = brotli.compress(body, quality=Config.RESPONSE_BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=Config.RESPONSE_GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,21 +1,32 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
 import sys
 import json
 import os
+import uuid
 from datetime import datetime, timedelta
 from config import Config, CORSConfig
+from log_utils import setup_logging, get_logger, request_id_var
 from utils import allowed_file, save_pdf_file, process_boxes_data, save_boxes_data, cleanup_uploads_folder
-from pdf_processor import process_pdf_with_pdfplumber
-from transaction_processor import process_transaction_text
-from db import db, transactions_collection
+from document_ingest import DocumentBusy, document_hash, ingest_document, retry_document
+from db import storage
 from auth import create_user, verify_user
+from password_hashing import AuthBusy
+from token_utils import verify_token
+from admission import admission_controller, AdmissionRejected
 import pandas as pd
 from loan_model import LoanModel
 from finance_processor import FinanceProcessor
+from feature_store import load_user_features
+from layout_templates import compute_fingerprint, save_template, match_template, list_templates
+from serialization import FastJSONProvider, frame_records, frame_columns, compress_response
 
 
+setup_logging()
+logger = get_logger(__name__)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, resources=CORSConfig.RESOURCES, supports_credentials=True)
 
 
@@ -24,6 +35,77 @@ Config.init_app()
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
 
 
+@app.before_request
+def assign_request_id():
+    """Tag every log record emitted while handling a request"""
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id_token = request_id_var.set(g.request_id)
+
+
+# Endpoints reachable without a bearer token
+PUBLIC_ENDPOINTS = {'signup', 'login', 'admission_metrics'}
+
+
+@app.before_request
+def authenticate_request():
+    """Resolve the bearer token (if any) to g.user using the token cache"""
+    g.user = None
+    if request.method == 'OPTIONS':
+        return None
+
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            g.user = verify_token(auth_header[len('Bearer '):])['user']
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 401
+    elif Config.AUTH_REQUIRED and request.endpoint not in PUBLIC_ENDPOINTS:
+        return jsonify({'error': 'Authorization token is required'}), 401
+
+    # A token may only act on its own user's data
+    if g.user is not None:
+        requested_user = request.args.get('user_id') or request.form.get('user_id')
+        if requested_user is None and request.is_json:
+            requested_user = (request.get_json(silent=True) or {}).get('user_id')
+        if requested_user is not None and requested_user != g.user['_id']:
+            return jsonify({'error': 'Token does not match user ID'}), 403
+    return None
+
+
+@app.after_request
+def expose_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+@app.after_request
+def compress_json_response(response):
+    return compress_response(response, request.accept_encodings)
+
+
+@app.teardown_request
+def clear_request_id(exc):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+
+def retry_later_response(error, **details):
+    """Build a 429 response carrying a Retry-After hint.
+
+    Accepts AdmissionRejected or AuthBusy, both of which carry retry_after.
+    details are added to the JSON body.
+    """
+    response = jsonify({
+        'error': str(error),
+        'retry_after': error.retry_after,
+        **details
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
 @app.route('/api/transactions', methods=['GET', 'OPTIONS'])
 def get_transactions():
     if request.method == 'OPTIONS':
@@ -42,35 +124,36 @@ def get_transactions():
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
 
-        # Fetch transactions from MongoDB
-        transactions = list(transactions_collection.find({'user_id': user_id}))
-        print(f"""Retrieved {len(transactions)} transactions for user {
-              user_id}""", flush=True)
+        # Fetch transactions from the storage backend
+        transactions = storage.find_transactions(user_id)
+        logger.info("Retrieved transactions", extra={'fields': {
+            'user_id': user_id, 'count': len(transactions)}})
 
-        # Convert ObjectId to string for JSON serialization
-        for transaction in transactions:
-            transaction['_id'] = str(transaction['_id'])
-            transaction['created_at'] = transaction['created_at'].isoformat()
-            transaction['date'] = transaction['date'].isoformat()
-
-        # Process transactions through FinanceProcessor
+        # ObjectId and datetime values are encoded by FastJSONProvider
+        # Use precomputed features when they are up to date
         try:
-            finance_features = FinanceProcessor.process_transactions(
-                transactions)
-            print(f"""Successfully processed financial features for user {
-                  user_id}""", flush=True)
-
-            # Convert Period objects to strings for JSON serialization
-            finance_features['month'] = finance_features['month'].astype(str)
+            finance_features = load_user_features(storage, user_id)
+            if finance_features is None:
+                finance_features = FinanceProcessor.process_transactions(
+                    transactions)
+                logger.info("Processed financial features",
+                            extra={'fields': {'user_id': user_id}})
+
+            # ?orient=columns returns {column: [values]} instead of one
+            # object per month
+            if request.args.get('orient') == 'columns':
+                features_payload = frame_columns(finance_features)
+            else:
+                features_payload = frame_records(finance_features)
 
             return jsonify({
                 'message': 'Transactions processed successfully',
                 'transactions': transactions,
-                'finance_features': finance_features.to_dict(orient='records')
+                'finance_features': features_payload
             }), 200
         except Exception as process_error:
-            print(f"""Error processing financial features: {
-                  str(process_error)}""", flush=True)
+            logger.exception(f"""Error processing financial features: {
+                             str(process_error)}""")
             return jsonify({
                 'message': 'Transactions retrieved but processing failed',
                 'transactions': transactions,
@@ -78,7 +161,7 @@ def get_transactions():
             }), 500
 
     except Exception as e:
-        print(f"Error retrieving transactions: {str(e)}", flush=True)
+        logger.exception(f"Error retrieving transactions: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
@@ -105,6 +188,8 @@ def signup():
             'user': user
         }), 201
 
+    except AuthBusy as e:
+        return retry_later_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -134,6 +219,8 @@ def login():
             'user': user
         }), 200
 
+    except AuthBusy as e:
+        return retry_later_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 401
     except Exception as e:
@@ -146,23 +233,31 @@ def submit_pdf():
     user_id = request.form.get('user_id')
     if not user_id:
         return jsonify({'error': 'User ID is required'}), 400
+
+    # Reject early when the extraction pipeline is saturated
     try:
-        print("Received request", flush=True)
+        admission_controller.check_capacity(user_id)
+    except AdmissionRejected as e:
+        return retry_later_response(e)
+
+    try:
+        logger.info("Received submission", extra={'fields': {'user_id': user_id}})
         # Check if files are present in request
         files = request.files.to_dict()
         if not files:
             return jsonify({'error': 'No files provided'}), 400
 
-        # Get boxes data
+        # Get boxes data; files without boxes are matched against the
+        # user's layout templates
         boxes_data = request.form.get('boxes')
-        if not boxes_data:
-            return jsonify({'error': 'No boxes data provided'}), 400
-
         try:
-            boxes = json.loads(boxes_data)
+            boxes = json.loads(boxes_data) if boxes_data else {}
         except json.JSONDecodeError:
             return jsonify({'error': 'Invalid boxes data format'}), 400
 
+        # Optional name under which the drawn boxes are saved as a template
+        template_name = request.form.get('template_name')
+
         results = []
         # Process each file sequentially
         for file_key, file in files.items():
@@ -172,67 +267,97 @@ def submit_pdf():
             if not allowed_file(file.filename):
                 return jsonify({'error': f'Invalid file type for {file.filename}. Only PDF files are allowed'}), 400
 
-            print(f"Processing file: {file.filename}", flush=True)
+            logger.info("Processing file", extra={'fields': {'file': file.filename}})
             # Save the PDF file
             filepath, filename = save_pdf_file(file)
+            content_hash = None
 
             try:
                 # Get boxes for this file from the boxes data
                 file_index = int(file_key.split('[')[1].split(']')[0])
                 file_boxes = boxes.get(str(file_index), {})
-                if not file_boxes:
-                    print(f"No boxes found for file {filename}", flush=True)
-                    continue
-
-                # Process boxes data for this file
-                processed_boxes = process_boxes_data(
-                    json.dumps(file_boxes), filepath)
-                print(f"""Processed boxes data for {
-                      filename}:""", processed_boxes, flush=True)
+                template_used = None
+                if file_boxes:
+                    # Process boxes data for this file
+                    processed_boxes = process_boxes_data(
+                        json.dumps(file_boxes), filepath)
+                    logger.info("Processed boxes data", extra={'fields': {
+                        'file': filename, 'pages': len(processed_boxes)}})
+
+                    if template_name:
+                        save_template(user_id, template_name, processed_boxes,
+                                      compute_fingerprint(filepath))
+                else:
+                    template = match_template(
+                        user_id, compute_fingerprint(filepath))
+                    if not template:
+                        logger.warning(
+                            f"No boxes or matching template found for file {filename}")
+                        continue
+                    processed_boxes = template['boxes']
+                    template_used = template['name']
+                    logger.info("Matched layout template", extra={'fields': {
+                        'file': filename, 'template': template_used}})
 
                 # Save the boxes data
                 boxes_filepath = save_boxes_data(processed_boxes, filename)
-                print(f"""Saved boxes data for {filename} to {
-                      boxes_filepath}""", flush=True)
-
-                # Process PDF with pdfplumber
-                output_files = process_pdf_with_pdfplumber(
-                    filepath, processed_boxes)
+                logger.debug("Saved boxes data", extra={'fields': {
+                    'file': filename, 'path': boxes_filepath}})
 
-                # Process extracted text page by page
+                # Stream changed pages through extraction, parsing and
+                # page-level writes; pages whose boxes match the previous
+                # submission of this PDF are reused as-is
+                content_hash = document_hash(filepath)
                 file_results = []
-                for page_data in output_files:
-                    page_number = page_data['page_number']
-                    print(f"""Processing page {page_number} of {
-                          filename}""", flush=True)
-
-                    try:
-                        # Process transactions for this page
-                        transactions = process_transaction_text(
-                            page_data['text'], user_id)
-
-                        print(f"""Processed transactions for page {
-                              page_number} of {filename}""", flush=True)
-
-                        file_results.append({
-                            'page_number': page_number,
-                            'transactions': transactions.to_list()
-                        })
-                    except Exception as process_error:
-                        print(f"""Error processing page {page_number} of {
-                              filename}: {str(process_error)}""", flush=True)
+                failed_pages = []
+                pages_extracted = 0
+                for page_summary in ingest_document(
+                        filepath, filename, processed_boxes, user_id,
+                        content_hash=content_hash):
+                    pages_extracted += 1
+                    page_number = page_summary['page_number']
+                    if page_summary['error']:
+                        logger.error(f"""Error processing page {page_number} of {
+                                     filename}: {page_summary['error']}""")
+                        failed_pages.append(page_number)
                         continue
 
+                    logger.info("Processed transactions for page", extra={
+                        'fields': {'file': filename, 'page': page_number,
+                                   'count': page_summary['transactions'],
+                                   'status': page_summary['status']}})
+                    file_results.append({
+                        'page_number': page_number,
+                        'transaction_count': page_summary['transactions'],
+                        'status': page_summary['status']
+                    })
+
+                if not pages_extracted:
+                    raise ValueError(
+                        "No text was successfully extracted from the PDF")
+
+                # Failed pages can be resumed with /api/documents/<hash>/retry
                 results.append({
                     'filename': filename,
                     'pdf_path': filepath,
                     'boxes_path': boxes_filepath,
-                    'pages': file_results
+                    'template': template_used,
+                    'document_hash': content_hash,
+                    'pages': file_results,
+                    'failed_pages': failed_pages
                 })
 
+            except AdmissionRejected as e:
+                # Pages committed before the rejection are kept and the
+                # document is left incomplete; submitting the same files
+                # again (or retrying the document) skips those pages and
+                # reuses parsed chunks, so no rows are duplicated
+                logger.warning(f"Submission rejected by admission control: {str(e)}")
+                return retry_later_response(
+                    e, resumable=content_hash is not None,
+                    document_hash=content_hash, results=results)
             except Exception as e:
-                print(f"""Error processing file {
-                      filename}: {str(e)}""", flush=True)
+                logger.exception(f"Error processing file {filename}: {str(e)}")
                 results.append({
                     'filename': filename,
                     'error': str(e)
@@ -245,16 +370,84 @@ def submit_pdf():
         if not results:
             return jsonify({'error': 'No files were successfully processed'}), 400
 
-        print("Processing completed successfully for all files", flush=True)
+        logger.info("Processing completed successfully for all files")
         return jsonify({
             'message': 'PDFs and boxes data processed successfully',
             'results': results
         }), 200
 
+    except AdmissionRejected as e:
+        logger.warning(f"Submission rejected by admission control: {str(e)}")
+        return retry_later_response(e)
+    except Exception as e:
+        logger.exception(f"Error occurred: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/templates', methods=['GET'])
+def get_templates():
+    """List the user's saved layout templates"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    return jsonify({'templates': list_templates(user_id)}), 200
+
+
+@app.route('/api/documents', methods=['GET'])
+def get_documents():
+    """List the user's submitted documents and their ingestion status"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    return jsonify({'documents': storage.find_documents(user_id)}), 200
+
+
+@app.route('/api/documents/<document_hash>/retry', methods=['POST'])
+def retry_document_ingestion(document_hash):
+    """Resume an incomplete document without repeating finished LLM work"""
+    user_id = request.form.get('user_id') or (
+        request.get_json(silent=True) or {}).get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+
+    document = storage.find_document(user_id, document_hash)
+    if document is None:
+        return jsonify({'error': 'Document not found'}), 404
+    if document.get('status') == 'complete':
+        return jsonify({'message': 'Document is already fully ingested',
+                        'document_hash': document_hash, 'status': 'complete',
+                        'pages': []}), 200
+
+    try:
+        admission_controller.check_capacity(user_id)
+        pages = [{'page_number': summary['page_number'],
+                  'transaction_count': summary['transactions'],
+                  'status': summary['status'],
+                  'error': summary['error']}
+                 for summary in retry_document(user_id, document_hash)]
+    except AdmissionRejected as e:
+        return retry_later_response(e)
+    except (DocumentBusy, ValueError) as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
-        print(f"Error occurred: {str(e)}", file=sys.stderr, flush=True)
+        logger.exception(f"Error retrying document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+    document = storage.find_document(user_id, document_hash)
+    return jsonify({
+        'message': 'Document retry finished',
+        'document_hash': document_hash,
+        'status': document['status'],
+        'error': document.get('error'),
+        'pages': pages
+    }), 200
+
+
+@app.route('/api/admission/metrics', methods=['GET'])
+def admission_metrics():
+    """Expose extraction queue depth and wait-time metrics"""
+    return jsonify(admission_controller.metrics()), 200
+
 
 @app.route('/api/loan/apply', methods=['POST', 'OPTIONS'])
 def apply_loan():
@@ -281,18 +474,23 @@ def apply_loan():
                 'error': f'Missing required fields. Required: {required_fields}'
             }), 400
 
-        # Get user transactions
-        transactions = list(transactions_collection.find(
-            {'user_id': data['user_id']}))
+        # Prefer precomputed features, then the memory-mapped columnar
+        # archive, and fall back to the storage backend's monthly aggregates
+        finance_features = load_user_features(storage, data['user_id'])
+        if finance_features is None:
+            finance_features = FinanceProcessor.process_archived_transactions(
+                data['user_id'], storage)
 
-        if not transactions:
-            return jsonify({
-                'error': 'No transaction history found for user'
-            }), 400
+        if finance_features is None:
+            aggregates = storage.monthly_aggregates(data['user_id'])
+            if aggregates.empty:
+                return jsonify({
+                    'error': 'No transaction history found for user'
+                }), 400
 
-        # Process transactions to get financial features
-        finance_features = FinanceProcessor.process_transactions(
-            transactions)
+            # Process monthly aggregates to get financial features
+            finance_features = FinanceProcessor.features_from_aggregates(
+                aggregates)
 
         # Calculate annual income (multiply monthly by 12 and use the most recent data)
         latest_features = finance_features.sort_values(
@@ -323,7 +521,7 @@ def apply_loan():
         }), 200
 
     except Exception as e:
-        print(f"Error processing loan application: {str(e)}", flush=True)
+        logger.exception(f"Error processing loan application: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
@@ -0,0 +1,909 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from pymongo import ReplaceOne, DeleteMany, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from finance_processor import FinanceProcessor
+from log_utils import get_logger
+from transaction_batch import NO_PAGE, TransactionBatch
+
+logger = get_logger(__name__)
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional; the sqlite backend needs nothing extra
+    duckdb = None
+
+
+# Document record fields besides the key, pages and timestamps
+DOCUMENT_FIELDS = ['filename', 'boxes', 'status', 'file_path', 'error']
+
+TRANSACTION_COLUMNS = ['_id', 'user_id', 'date', 'description', 'prefix',
+                       'amount', 'category', 'created_at', 'document_hash',
+                       'page_number']
+# Read into a TransactionBatch by default
+BATCH_COLUMNS = ['date', 'description', 'prefix', 'amount', 'category',
+                 'created_at']
+
+
+class StorageBackend:
+    """Persistence used by the API: users, transactions, features and templates.
+
+    Documents are plain dicts shaped like the MongoDB documents the app has
+    always used ('_id' as a string for embedded backends, dates as datetime).
+    """
+
+    # Users
+    def find_user_by_email(self, email: str):
+        raise NotImplementedError
+
+    def insert_user(self, user: dict) -> str:
+        raise NotImplementedError
+
+    # Transactions
+    def insert_transactions(self, documents: list) -> list:
+        """Insert documents, setting '_id' on each, and return the IDs as strings"""
+        raise NotImplementedError
+
+    def insert_transaction_batch(self, batch: TransactionBatch) -> list:
+        """Insert a batch, setting batch.ids, and return the IDs as strings.
+
+        Rows get their created_at when they are written, not when parsed.
+        """
+        raise NotImplementedError
+
+    def find_transactions(self, user_id: str, columns: list = None) -> list:
+        raise NotImplementedError
+
+    def find_transaction_batch(self, user_id: str,
+                               columns: list = None) -> TransactionBatch:
+        """A user's transactions as a TransactionBatch.
+
+        columns limits what is read and must include FEATURE_COLUMNS.
+        """
+        raise NotImplementedError
+
+    def count_transactions(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def latest_transaction_created_at(self, user_id: str):
+        raise NotImplementedError
+
+    def transaction_user_ids(self) -> list:
+        raise NotImplementedError
+
+    def replace_page_transactions(self, user_id: str, document_hash: str,
+                                  page_number: int, batch: TransactionBatch) -> tuple:
+        """Atomically swap the rows extracted from one page of a document.
+
+        Returns (inserted IDs, number of stale rows deleted) and sets batch.ids.
+        Rows get their created_at when they are written, as above.
+        """
+        raise NotImplementedError
+
+    # Ingested documents
+    def find_document(self, user_id: str, document_hash: str):
+        """Document state with a 'pages' mapping of page number (str) -> page state"""
+        raise NotImplementedError
+
+    def find_documents(self, user_id: str) -> list:
+        """Document records for a user, newest first, without boxes or pages"""
+        raise NotImplementedError
+
+    def save_document(self, user_id: str, document_hash: str, **fields):
+        """Create the document record or update the given DOCUMENT_FIELDS"""
+        raise NotImplementedError
+
+    def claim_document(self, user_id: str, document_hash: str, lease: str,
+                       stale_before: datetime) -> bool:
+        """Atomically mark the document 'processing' under the `lease` token,
+        creating it if needed.
+
+        Returns False, changing nothing, when it is already 'processing' and
+        was updated at or after stale_before.
+        """
+        raise NotImplementedError
+
+    def renew_document_lease(self, user_id: str, document_hash: str,
+                             lease: str) -> bool:
+        """Bump updated_at if `lease` still holds the 'processing' claim.
+
+        Returns False once the document was finished or claimed by another run.
+        """
+        raise NotImplementedError
+
+    def save_document_page(self, user_id: str, document_hash: str,
+                           page_number: int, page_state: dict):
+        raise NotImplementedError
+
+    def remove_document_page(self, user_id: str, document_hash: str,
+                             page_number: int):
+        raise NotImplementedError
+
+    def find_chunk_checkpoints(self, user_id: str, document_hash: str,
+                               page_number: int) -> dict:
+        """Parsed chunks saved for a page: chunk index -> {'chunk_hash', 'result'}"""
+        raise NotImplementedError
+
+    def save_chunk_checkpoint(self, user_id: str, document_hash: str,
+                              page_number: int, chunk_index: int,
+                              chunk_hash: str, result: dict):
+        raise NotImplementedError
+
+    def clear_chunk_checkpoints(self, user_id: str, document_hash: str,
+                                page_number: int):
+        raise NotImplementedError
+
+    # Feature queries
+    def monthly_aggregates(self, user_id: str) -> pd.DataFrame:
+        """FinanceProcessor.monthly_aggregates for one user's transactions"""
+        raise NotImplementedError
+
+    def replace_features(self, documents_by_user: dict):
+        """Replace each user's precomputed monthly feature documents"""
+        raise NotImplementedError
+
+    def find_features(self, user_id: str) -> list:
+        """Precomputed feature documents for a user, sorted by month"""
+        raise NotImplementedError
+
+    # Layout templates
+    def save_template(self, template: dict):
+        raise NotImplementedError
+
+    def find_template(self, user_id: str, name: str):
+        raise NotImplementedError
+
+    def find_template_by_fingerprint(self, user_id: str, fingerprint: str):
+        """Most recently updated template with this fingerprint, if any"""
+        raise NotImplementedError
+
+    def list_templates(self, user_id: str) -> list:
+        """Templates for a user sorted by name, without their boxes"""
+        raise NotImplementedError
+
+
+class MongoStorage(StorageBackend):
+    def __init__(self, db):
+        self.db = db
+        self.users = db['users']
+        self.transactions = db['transactions']
+        self.features = db[Config.FEATURES_COLLECTION]
+        self.templates = db[Config.LAYOUT_TEMPLATES_COLLECTION]
+        self.documents = db[Config.DOCUMENTS_COLLECTION]
+        self.chunks = db[Config.CHUNK_CHECKPOINTS_COLLECTION]
+
+        # Supports per-user reads and the feature freshness check
+        self.transactions.create_index([('user_id', 1), ('created_at', -1)])
+        self.transactions.create_index(
+            [('user_id', 1), ('document_hash', 1), ('page_number', 1)])
+        self.documents.create_index(
+            [('user_id', 1), ('document_hash', 1)], unique=True)
+        self.chunks.create_index(
+            [('user_id', 1), ('document_hash', 1), ('page_number', 1),
+             ('chunk_index', 1)], unique=True)
+        self.features.create_index([('user_id', 1), ('month', 1)], unique=True)
+        self.templates.create_index([('user_id', 1), ('name', 1)], unique=True)
+        self.templates.create_index([('user_id', 1), ('fingerprint', 1)])
+
+    def find_user_by_email(self, email: str):
+        return self.users.find_one({'email': email})
+
+    def insert_user(self, user: dict) -> str:
+        result = self.users.insert_one(user)
+        if not result.inserted_id:
+            raise Exception('Failed to create user')
+        return str(result.inserted_id)
+
+    def insert_transactions(self, documents: list) -> list:
+        result = self.transactions.insert_many(documents)
+        if len(result.inserted_ids) != len(documents):
+            raise Exception("Failed to save transactions to MongoDB")
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    def insert_transaction_batch(self, batch: TransactionBatch) -> list:
+        # pymongo only takes dicts; they are built here and dropped after encoding
+        batch.stamp_created_at()
+        batch.ids = self.insert_transactions(batch.to_documents())
+        return batch.ids
+
+    def _projection(self, columns: list):
+        if not columns:
+            return None
+        projection = {column: 1 for column in columns}
+        projection.setdefault('_id', 0)
+        return projection
+
+    def find_transactions(self, user_id: str, columns: list = None) -> list:
+        return list(self.transactions.find({'user_id': user_id},
+                                           self._projection(columns)))
+
+    def find_transaction_batch(self, user_id: str,
+                               columns: list = None) -> TransactionBatch:
+        # Documents are decoded one cursor batch at a time and reduced to columns
+        cursor = self.transactions.find(
+            {'user_id': user_id},
+            self._projection(columns or BATCH_COLUMNS))
+        return TransactionBatch.from_documents(cursor, user_id)
+
+    def count_transactions(self, user_id: str) -> int:
+        return self.transactions.count_documents({'user_id': user_id})
+
+    def latest_transaction_created_at(self, user_id: str):
+        latest = self.transactions.find_one(
+            {'user_id': user_id}, {'created_at': 1},
+            sort=[('created_at', DESCENDING)])
+        return latest.get('created_at') if latest else None
+
+    def transaction_user_ids(self) -> list:
+        return sorted(self.transactions.distinct('user_id'))
+
+    def _supports_transactions(self) -> bool:
+        # Multi-document transactions need a replica set or sharded cluster
+        return self.db.client.topology_description.topology_type_name in (
+            'ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+
+    def replace_page_transactions(self, user_id: str, document_hash: str,
+                                  page_number: int, batch: TransactionBatch) -> tuple:
+        batch.stamp_created_at()
+        documents = batch.to_documents()
+        page_filter = {'user_id': user_id, 'document_hash': document_hash,
+                       'page_number': page_number}
+
+        def swap(session=None):
+            inserted_ids = []
+            if documents:
+                inserted_ids = self.transactions.insert_many(
+                    documents, session=session).inserted_ids
+            stale = dict(page_filter, _id={'$nin': inserted_ids})
+            deleted = self.transactions.delete_many(stale, session=session)
+            batch.ids = [str(i) for i in inserted_ids]
+            return batch.ids, deleted.deleted_count
+
+        if self._supports_transactions():
+            with self.db.client.start_session() as session:
+                return session.with_transaction(swap)
+        # Standalone server: insert before deleting so the page is never
+        # empty; readers may briefly see both versions
+        return swap()
+
+    def find_document(self, user_id: str, document_hash: str):
+        return self.documents.find_one(
+            {'user_id': user_id, 'document_hash': document_hash}, {'_id': 0})
+
+    def find_documents(self, user_id: str) -> list:
+        return list(self.documents.find(
+            {'user_id': user_id}, {'_id': 0, 'boxes': 0, 'pages': 0, 'lease': 0}
+        ).sort('updated_at', DESCENDING))
+
+    def save_document(self, user_id: str, document_hash: str, **fields):
+        now = datetime.now()
+        self.documents.update_one(
+            {'user_id': user_id, 'document_hash': document_hash},
+            {'$set': {**fields, 'updated_at': now},
+             '$setOnInsert': {'created_at': now, 'pages': {}}},
+            upsert=True)
+
+    def claim_document(self, user_id: str, document_hash: str, lease: str,
+                       stale_before: datetime) -> bool:
+        now = datetime.now()
+        try:
+            # A live claim fails the filter, and the upsert then collides
+            # with the unique (user_id, document_hash) index
+            self.documents.update_one(
+                {'user_id': user_id, 'document_hash': document_hash,
+                 '$or': [{'status': {'$ne': 'processing'}},
+                         {'updated_at': {'$lt': stale_before}}]},
+                {'$set': {'status': 'processing', 'lease': lease, 'updated_at': now},
+                 '$setOnInsert': {'created_at': now, 'pages': {}}},
+                upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def renew_document_lease(self, user_id: str, document_hash: str,
+                             lease: str) -> bool:
+        result = self.documents.update_one(
+            {'user_id': user_id, 'document_hash': document_hash,
+             'status': 'processing', 'lease': lease},
+            {'$set': {'updated_at': datetime.now()}})
+        return result.matched_count == 1
+
+    def save_document_page(self, user_id: str, document_hash: str,
+                           page_number: int, page_state: dict):
+        self.documents.update_one(
+            {'user_id': user_id, 'document_hash': document_hash},
+            {'$set': {f'pages.{page_number}': page_state,
+                      'updated_at': datetime.now()}})
+
+    def remove_document_page(self, user_id: str, document_hash: str,
+                             page_number: int):
+        self.documents.update_one(
+            {'user_id': user_id, 'document_hash': document_hash},
+            {'$unset': {f'pages.{page_number}': ''},
+             '$set': {'updated_at': datetime.now()}})
+
+    def find_chunk_checkpoints(self, user_id: str, document_hash: str,
+                               page_number: int) -> dict:
+        return {chunk['chunk_index']: chunk for chunk in self.chunks.find(
+            {'user_id': user_id, 'document_hash': document_hash,
+             'page_number': page_number}, {'_id': 0})}
+
+    def save_chunk_checkpoint(self, user_id: str, document_hash: str,
+                              page_number: int, chunk_index: int,
+                              chunk_hash: str, result: dict):
+        key = {'user_id': user_id, 'document_hash': document_hash,
+               'page_number': page_number, 'chunk_index': chunk_index}
+        self.chunks.replace_one(
+            key, {**key, 'chunk_hash': chunk_hash, 'result': result}, upsert=True)
+
+    def clear_chunk_checkpoints(self, user_id: str, document_hash: str,
+                                page_number: int):
+        self.chunks.delete_many({'user_id': user_id, 'document_hash': document_hash,
+                                 'page_number': page_number})
+
+    def monthly_aggregates(self, user_id: str) -> pd.DataFrame:
+        return FinanceProcessor.monthly_aggregates(self.find_transaction_batch(
+            user_id, FinanceProcessor.FEATURE_COLUMNS))
+
+    def replace_features(self, documents_by_user: dict):
+        operations = []
+        for user_id, documents in documents_by_user.items():
+            # Replace every computed month and drop months with no transactions
+            operations.extend(
+                ReplaceOne({'user_id': user_id, 'month': doc['month']}, doc, upsert=True)
+                for doc in documents)
+            operations.append(DeleteMany({
+                'user_id': user_id,
+                'month': {'$nin': [doc['month'] for doc in documents]}
+            }))
+        if not operations:
+            return None
+        return self.features.bulk_write(operations, ordered=False)
+
+    def find_features(self, user_id: str) -> list:
+        return list(self.features.find(
+            {'user_id': user_id}, {'_id': 0, 'user_id': 0}).sort('month', 1))
+
+    def save_template(self, template: dict):
+        self.templates.replace_one(
+            {'user_id': template['user_id'], 'name': template['name']},
+            template, upsert=True)
+
+    def find_template(self, user_id: str, name: str):
+        return self.templates.find_one(
+            {'user_id': user_id, 'name': name}, {'_id': 0})
+
+    def find_template_by_fingerprint(self, user_id: str, fingerprint: str):
+        return self.templates.find_one(
+            {'user_id': user_id, 'fingerprint': fingerprint}, {'_id': 0},
+            sort=[('updated_at', DESCENDING)])
+
+    def list_templates(self, user_id: str) -> list:
+        return list(self.templates.find(
+            {'user_id': user_id}, {'_id': 0, 'boxes': 0}).sort('name', 1))
+
+
+# sqlite3's built-in datetime adapters are deprecated; store ISO strings and
+# parse columns declared TIMESTAMP back into datetimes
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter(
+    'TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SQLStorage(StorageBackend):
+    """Embedded single-file storage; monthly aggregates run as SQL in-process.
+
+    One connection is shared and guarded by a lock, so this suits a single
+    API process. Subclasses supply the connection and dialect differences.
+    """
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS users (
+            _id VARCHAR PRIMARY KEY,
+            email VARCHAR NOT NULL UNIQUE,
+            password VARCHAR NOT NULL,
+            created_at TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS transactions (
+            _id VARCHAR PRIMARY KEY,
+            user_id VARCHAR NOT NULL,
+            date TIMESTAMP,
+            description VARCHAR,
+            prefix INTEGER,
+            amount DOUBLE,
+            category VARCHAR,
+            created_at TIMESTAMP,
+            document_hash VARCHAR,
+            page_number INTEGER)""",
+        """CREATE INDEX IF NOT EXISTS transactions_user_created
+            ON transactions (user_id, created_at)""",
+        """CREATE INDEX IF NOT EXISTS transactions_user_document_page
+            ON transactions (user_id, document_hash, page_number)""",
+        """CREATE TABLE IF NOT EXISTS documents (
+            user_id VARCHAR NOT NULL,
+            document_hash VARCHAR NOT NULL,
+            filename VARCHAR,
+            boxes VARCHAR,
+            status VARCHAR,
+            file_path VARCHAR,
+            error VARCHAR,
+            lease VARCHAR,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (user_id, document_hash))""",
+        """CREATE TABLE IF NOT EXISTS document_pages (
+            user_id VARCHAR NOT NULL,
+            document_hash VARCHAR NOT NULL,
+            page_number INTEGER NOT NULL,
+            state VARCHAR,
+            PRIMARY KEY (user_id, document_hash, page_number))""",
+        """CREATE TABLE IF NOT EXISTS document_chunks (
+            user_id VARCHAR NOT NULL,
+            document_hash VARCHAR NOT NULL,
+            page_number INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            chunk_hash VARCHAR,
+            result VARCHAR,
+            PRIMARY KEY (user_id, document_hash, page_number, chunk_index))""",
+        """CREATE TABLE IF NOT EXISTS monthly_features (
+            user_id VARCHAR NOT NULL,
+            month VARCHAR NOT NULL,
+            computed_at TIMESTAMP,
+            features VARCHAR,
+            PRIMARY KEY (user_id, month))""",
+        """CREATE TABLE IF NOT EXISTS layout_templates (
+            user_id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            fingerprint VARCHAR,
+            boxes VARCHAR,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (user_id, name))"""
+    ]
+
+    # Mirrors FinanceProcessor._aggregate_months, including the date bounds
+    MONTHLY_AGGREGATES_SQL = """
+        SELECT {month} AS month,
+            SUM(CASE WHEN prefix = 1 AND category IN ('income', 'financial')
+                     THEN amount ELSE 0 END) AS monthly_income,
+            ABS(SUM(CASE WHEN prefix = -1 THEN amount ELSE 0 END)) AS monthly_expenses,
+            ABS(AVG(amount)) AS avg_transaction_amount,
+            ABS(SUM(CASE WHEN category = 'Financial' AND prefix = -1
+                         THEN amount ELSE 0 END)) AS total_loan_payment,
+            SUM(CASE WHEN category = 'Financial' AND prefix = -1
+                     THEN 1 ELSE 0 END) AS num_loans_paid,
+            ABS(SUM(CASE WHEN category IN ('Shopping', 'Entertainment', 'Food')
+                              AND prefix = -1
+                         THEN amount ELSE 0 END)) AS credit_expenses
+        FROM transactions
+        WHERE user_id = ? AND date >= ? AND date < ?
+        GROUP BY 1
+        ORDER BY 1"""
+    DATE_BOUNDS = (datetime(1950, 1, 1), datetime(2081, 1, 1))
+
+    # strftime argument order differs between engines
+    MONTH_EXPRESSION = None
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._lock = threading.Lock()
+        with self._lock:
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        """Run a read and return rows as dicts"""
+        with self._lock:
+            cursor = self._connection.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _query_columns(self, sql: str, params: tuple = ()) -> dict:
+        """Run a read and return {column: values}"""
+        with self._lock:
+            cursor = self._connection.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        return dict(zip(names, zip(*rows) if rows else [()] * len(names)))
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the connection for a single transaction"""
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                yield self._connection
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+
+    def _execute(self, statements: list):
+        """Run (sql, params) pairs in a single transaction"""
+        with self._transaction() as connection:
+            for sql, params in statements:
+                connection.execute(sql, params)
+
+    def _insert_rows(self, table: str, columns: list, rows: list):
+        with self._transaction():
+            self._write_rows(table, columns, rows)
+
+    def _write_rows(self, table: str, columns: list, rows: list):
+        # Caller holds a transaction
+        placeholders = ', '.join('?' for _ in columns)
+        self._connection.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            rows)
+
+    def _write_batch(self, batch: TransactionBatch, ids: list):
+        # Caller holds a transaction
+        columns = {'_id': ids, **batch.columns()}
+        placeholders = ', '.join('?' for _ in columns)
+        self._connection.executemany(
+            f"INSERT INTO transactions ({', '.join(columns)}) VALUES ({placeholders})",
+            zip(*columns.values()))
+
+    def find_user_by_email(self, email: str):
+        rows = self._query('SELECT * FROM users WHERE email = ?', (email,))
+        return rows[0] if rows else None
+
+    def insert_user(self, user: dict) -> str:
+        user['_id'] = uuid.uuid4().hex
+        self._insert_rows('users', ['_id', 'email', 'password', 'created_at'],
+                          [(user['_id'], user['email'], user['password'],
+                            user['created_at'])])
+        return user['_id']
+
+    def _transaction_rows(self, documents: list) -> list:
+        for document in documents:
+            document['_id'] = uuid.uuid4().hex
+        return [tuple(document.get(column) for column in TRANSACTION_COLUMNS)
+                for document in documents]
+
+    def insert_transactions(self, documents: list) -> list:
+        self._insert_rows('transactions', TRANSACTION_COLUMNS,
+                          self._transaction_rows(documents))
+        return [document['_id'] for document in documents]
+
+    def insert_transaction_batch(self, batch: TransactionBatch) -> list:
+        ids = [uuid.uuid4().hex for _ in range(len(batch))]
+        if ids:
+            with self._transaction():
+                batch.stamp_created_at()
+                self._write_batch(batch, ids)
+        batch.ids = ids
+        return ids
+
+    def find_transactions(self, user_id: str, columns: list = None) -> list:
+        selected = ', '.join(columns) if columns else ', '.join(TRANSACTION_COLUMNS)
+        return self._query(
+            f"SELECT {selected} FROM transactions WHERE user_id = ?", (user_id,))
+
+    def find_transaction_batch(self, user_id: str,
+                               columns: list = None) -> TransactionBatch:
+        selected = ', '.join(columns or BATCH_COLUMNS)
+        return TransactionBatch.from_columns(user_id, self._query_columns(
+            f"SELECT {selected} FROM transactions WHERE user_id = ?", (user_id,)))
+
+    def count_transactions(self, user_id: str) -> int:
+        return self._query(
+            'SELECT COUNT(*) AS count FROM transactions WHERE user_id = ?',
+            (user_id,))[0]['count']
+
+    def latest_transaction_created_at(self, user_id: str):
+        rows = self._query(
+            'SELECT created_at FROM transactions WHERE user_id = ? '
+            'ORDER BY created_at DESC LIMIT 1', (user_id,))
+        return rows[0]['created_at'] if rows else None
+
+    def transaction_user_ids(self) -> list:
+        return [row['user_id'] for row in self._query(
+            'SELECT DISTINCT user_id FROM transactions ORDER BY user_id')]
+
+    def replace_page_transactions(self, user_id: str, document_hash: str,
+                                  page_number: int, batch: TransactionBatch) -> tuple:
+        ids = [uuid.uuid4().hex for _ in range(len(batch))]
+        page = (user_id, document_hash, page_number)
+        with self._transaction() as connection:
+            deleted = connection.execute(
+                'SELECT COUNT(*) FROM transactions '
+                'WHERE user_id = ? AND document_hash = ? AND page_number = ?',
+                page).fetchone()[0]
+            connection.execute(
+                'DELETE FROM transactions '
+                'WHERE user_id = ? AND document_hash = ? AND page_number = ?',
+                page)
+            if ids:
+                batch.stamp_created_at()
+                self._write_batch(batch, ids)
+        batch.ids = ids
+        return ids, deleted
+
+    def _document_from_row(self, row: dict) -> dict:
+        if row.get('boxes') is not None:
+            row['boxes'] = json.loads(row['boxes'])
+        return row
+
+    def find_document(self, user_id: str, document_hash: str):
+        key = (user_id, document_hash)
+        documents = self._query(
+            'SELECT * FROM documents WHERE user_id = ? AND document_hash = ?', key)
+        if not documents:
+            return None
+        pages = self._query(
+            'SELECT page_number, state FROM document_pages '
+            'WHERE user_id = ? AND document_hash = ?', key)
+        return {**self._document_from_row(documents[0]), 'pages': {
+            str(page['page_number']): json.loads(page['state']) for page in pages}}
+
+    def find_documents(self, user_id: str) -> list:
+        columns = ', '.join(['user_id', 'document_hash', 'filename', 'status',
+                             'file_path', 'error', 'created_at', 'updated_at'])
+        return self._query(
+            f'SELECT {columns} FROM documents WHERE user_id = ? '
+            'ORDER BY updated_at DESC', (user_id,))
+
+    def save_document(self, user_id: str, document_hash: str, **fields):
+        unknown = set(fields) - set(DOCUMENT_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown document fields: {sorted(unknown)}')
+        if 'boxes' in fields:
+            fields['boxes'] = json.dumps(fields['boxes'])
+
+        now = datetime.now()
+        key = (user_id, document_hash)
+        with self._transaction() as connection:
+            exists = connection.execute(
+                'SELECT COUNT(*) FROM documents WHERE user_id = ? AND document_hash = ?',
+                key).fetchone()[0]
+            if exists:
+                assignments = ''.join(f'{name} = ?, ' for name in fields)
+                connection.execute(
+                    f'UPDATE documents SET {assignments}updated_at = ? '
+                    'WHERE user_id = ? AND document_hash = ?',
+                    (*fields.values(), now, *key))
+            else:
+                columns = ['user_id', 'document_hash', *fields, 'created_at', 'updated_at']
+                placeholders = ', '.join('?' for _ in columns)
+                connection.execute(
+                    f"INSERT INTO documents ({', '.join(columns)}) VALUES ({placeholders})",
+                    (*key, *fields.values(), now, now))
+
+    def claim_document(self, user_id: str, document_hash: str, lease: str,
+                       stale_before: datetime) -> bool:
+        now = datetime.now()
+        key = (user_id, document_hash)
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT status, updated_at FROM documents '
+                'WHERE user_id = ? AND document_hash = ?', key).fetchone()
+            if row is None:
+                connection.execute(
+                    'INSERT INTO documents (user_id, document_hash, status, lease, '
+                    'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (*key, 'processing', lease, now, now))
+                return True
+            status, updated_at = row
+            if status == 'processing' and updated_at >= stale_before:
+                return False
+            connection.execute(
+                'UPDATE documents SET status = ?, lease = ?, updated_at = ? '
+                'WHERE user_id = ? AND document_hash = ?',
+                ('processing', lease, now, *key))
+        return True
+
+    def renew_document_lease(self, user_id: str, document_hash: str,
+                             lease: str) -> bool:
+        key = (user_id, document_hash)
+        with self._transaction() as connection:
+            held = connection.execute(
+                'SELECT COUNT(*) FROM documents WHERE user_id = ? AND document_hash = ? '
+                "AND status = 'processing' AND lease = ?", (*key, lease)).fetchone()[0]
+            if held:
+                connection.execute(
+                    'UPDATE documents SET updated_at = ? '
+                    'WHERE user_id = ? AND document_hash = ?', (datetime.now(), *key))
+        return bool(held)
+
+    def save_document_page(self, user_id: str, document_hash: str,
+                           page_number: int, page_state: dict):
+        page = (user_id, document_hash, page_number)
+        self._execute([
+            ('DELETE FROM document_pages '
+             'WHERE user_id = ? AND document_hash = ? AND page_number = ?', page),
+            ('INSERT INTO document_pages (user_id, document_hash, page_number, state) '
+             'VALUES (?, ?, ?, ?)', (*page, json.dumps(page_state, default=str))),
+            ('UPDATE documents SET updated_at = ? '
+             'WHERE user_id = ? AND document_hash = ?',
+             (datetime.now(), user_id, document_hash))
+        ])
+
+    def remove_document_page(self, user_id: str, document_hash: str,
+                             page_number: int):
+        self._execute([
+            ('DELETE FROM document_pages '
+             'WHERE user_id = ? AND document_hash = ? AND page_number = ?',
+             (user_id, document_hash, page_number)),
+            ('UPDATE documents SET updated_at = ? '
+             'WHERE user_id = ? AND document_hash = ?',
+             (datetime.now(), user_id, document_hash))
+        ])
+
+    def find_chunk_checkpoints(self, user_id: str, document_hash: str,
+                               page_number: int) -> dict:
+        rows = self._query(
+            'SELECT chunk_index, chunk_hash, result FROM document_chunks '
+            'WHERE user_id = ? AND document_hash = ? AND page_number = ?',
+            (user_id, document_hash, page_number))
+        return {row['chunk_index']: {'chunk_hash': row['chunk_hash'],
+                                     'result': json.loads(row['result'])}
+                for row in rows}
+
+    def save_chunk_checkpoint(self, user_id: str, document_hash: str,
+                              page_number: int, chunk_index: int,
+                              chunk_hash: str, result: dict):
+        chunk = (user_id, document_hash, page_number, chunk_index)
+        self._execute([
+            ('DELETE FROM document_chunks WHERE user_id = ? AND document_hash = ? '
+             'AND page_number = ? AND chunk_index = ?', chunk),
+            ('INSERT INTO document_chunks (user_id, document_hash, page_number, '
+             'chunk_index, chunk_hash, result) VALUES (?, ?, ?, ?, ?, ?)',
+             (*chunk, chunk_hash, json.dumps(result)))
+        ])
+
+    def clear_chunk_checkpoints(self, user_id: str, document_hash: str,
+                                page_number: int):
+        self._execute([
+            ('DELETE FROM document_chunks '
+             'WHERE user_id = ? AND document_hash = ? AND page_number = ?',
+             (user_id, document_hash, page_number))
+        ])
+
+    def monthly_aggregates(self, user_id: str) -> pd.DataFrame:
+        rows = self._query(
+            self.MONTHLY_AGGREGATES_SQL.format(month=self.MONTH_EXPRESSION),
+            (user_id, *self.DATE_BOUNDS))
+        aggregates = pd.DataFrame(rows, columns=FinanceProcessor.AGGREGATE_COLUMNS)
+        aggregates['month'] = pd.PeriodIndex(aggregates['month'], freq='M')
+        return aggregates
+
+    def replace_features(self, documents_by_user: dict):
+        statements = []
+        for user_id, documents in documents_by_user.items():
+            statements.append(
+                ('DELETE FROM monthly_features WHERE user_id = ?', (user_id,)))
+            for document in documents:
+                values = {key: value for key, value in document.items()
+                          if key not in ('user_id', 'month', 'computed_at')}
+                statements.append((
+                    'INSERT INTO monthly_features (user_id, month, computed_at, features) '
+                    'VALUES (?, ?, ?, ?)',
+                    (user_id, document['month'], document['computed_at'],
+                     json.dumps(values, default=float))))
+        if statements:
+            self._execute(statements)
+
+    def find_features(self, user_id: str) -> list:
+        rows = self._query(
+            'SELECT month, computed_at, features FROM monthly_features '
+            'WHERE user_id = ? ORDER BY month', (user_id,))
+        return [{'month': row['month'], 'computed_at': row['computed_at'],
+                 **json.loads(row['features'])} for row in rows]
+
+    def _template_from_row(self, row: dict) -> dict:
+        if 'boxes' in row:
+            row['boxes'] = json.loads(row['boxes'])
+        return row
+
+    def save_template(self, template: dict):
+        self._execute([
+            ('DELETE FROM layout_templates WHERE user_id = ? AND name = ?',
+             (template['user_id'], template['name'])),
+            ('INSERT INTO layout_templates (user_id, name, fingerprint, boxes, updated_at) '
+             'VALUES (?, ?, ?, ?, ?)',
+             (template['user_id'], template['name'], template['fingerprint'],
+              json.dumps(template['boxes']), template['updated_at']))
+        ])
+
+    def find_template(self, user_id: str, name: str):
+        rows = self._query(
+            'SELECT * FROM layout_templates WHERE user_id = ? AND name = ?',
+            (user_id, name))
+        return self._template_from_row(rows[0]) if rows else None
+
+    def find_template_by_fingerprint(self, user_id: str, fingerprint: str):
+        rows = self._query(
+            'SELECT * FROM layout_templates WHERE user_id = ? AND fingerprint = ? '
+            'ORDER BY updated_at DESC LIMIT 1', (user_id, fingerprint))
+        return self._template_from_row(rows[0]) if rows else None
+
+    def list_templates(self, user_id: str) -> list:
+        return self._query(
+            'SELECT user_id, name, fingerprint, updated_at FROM layout_templates '
+            'WHERE user_id = ? ORDER BY name', (user_id,))
+
+
+class SQLiteStorage(SQLStorage):
+    MONTH_EXPRESSION = "strftime('%Y-%m', date)"
+
+    def __init__(self, path: str):
+        # isolation_level=None: transactions are managed with explicit BEGIN
+        connection = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        if path != ':memory:':
+            connection.execute('PRAGMA journal_mode=WAL')
+        super().__init__(connection)
+
+
+class DuckDBStorage(SQLStorage):
+    MONTH_EXPRESSION = "strftime(date, '%Y-%m')"
+
+    def __init__(self, path: str):
+        if duckdb is None:
+            raise RuntimeError('duckdb is required for the duckdb storage backend')
+        super().__init__(duckdb.connect(path))
+
+    def _write_rows(self, table: str, columns: list, rows: list):
+        # DuckDB inserts row-by-row through executemany; appending a
+        # DataFrame goes through its columnar path instead
+        frame = pd.DataFrame.from_records(rows, columns=columns)
+        self._connection.register('_insert_frame', frame)
+        try:
+            self._connection.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"SELECT {', '.join(columns)} FROM _insert_frame")
+        finally:
+            self._connection.unregister('_insert_frame')
+
+    def _query_columns(self, sql: str, params: tuple = ()) -> dict:
+        # Fetch through DuckDB's columnar result instead of row tuples
+        with self._lock:
+            frame = self._connection.execute(sql, params).df()
+        columns = {}
+        for name in frame.columns:
+            values = frame[name]
+            if not (pd.api.types.is_numeric_dtype(values.dtype)
+                    or pd.api.types.is_datetime64_any_dtype(values.dtype)):
+                values = values.astype(object).where(values.notna(), None)
+            columns[name] = values.to_numpy()
+        return columns
+
+    def _write_batch(self, batch: TransactionBatch, ids: list):
+        # Hand DuckDB the batch's arrays; constant columns are bound once
+        frame = batch.to_frame(['date', 'description', 'prefix', 'amount',
+                                'created_at', 'page_number'])
+        frame['_id'] = ids
+        frame['category'] = batch.categories()
+        self._connection.register('_insert_frame', frame)
+        try:
+            self._connection.execute(
+                f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) "
+                "SELECT _id, ?, date, description, prefix, amount, category, "
+                f"created_at, ?, NULLIF(page_number, {NO_PAGE}) FROM _insert_frame",
+                (batch.user_id, batch.document_hash))
+        finally:
+            self._connection.unregister('_insert_frame')
+
+
+def create_storage(backend: str = None, db=None) -> StorageBackend:
+    """Build the storage backend named by Config.STORAGE_BACKEND.
+
+    Args:
+        backend: 'mongo', 'duckdb' or 'sqlite'
+        db: pymongo Database, required for the mongo backend
+    """
+    backend = (backend or Config.STORAGE_BACKEND).lower()
+    if backend == 'mongo':
+        return MongoStorage(db)
+    if backend == 'duckdb':
+        return DuckDBStorage(Config.EMBEDDED_DB_PATH)
+    if backend == 'sqlite':
+        return SQLiteStorage(Config.EMBEDDED_DB_PATH)
+    raise ValueError(f'Unknown storage backend: {backend}')
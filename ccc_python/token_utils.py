@@ -1,8 +1,45 @@
 import jwt
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from config import Config
 
 
+class TokenCache:
+    """LRU cache of verified token payloads that expires with the token's exp"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict):
+        expires_at = payload.get('exp')
+        if expires_at is None:
+            return
+        with self._lock:
+            self._entries[token] = (payload, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_token_cache = TokenCache(Config.TOKEN_CACHE_SIZE)
+
+
 def generate_token(user_data: dict) -> str:
     """Generate a JWT token for the user"""
     payload = {
@@ -17,12 +54,18 @@ def generate_token(user_data: dict) -> str:
 
 
 def verify_token(token: str) -> dict:
-    """Verify and decode a JWT token"""
+    """Verify and decode a JWT token, reusing cached results until exp"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, Config.JWT_SECRET_KEY,
                              algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         raise ValueError('Token has expired')
     except jwt.InvalidTokenError:
         raise ValueError('Invalid token')
+
+    _token_cache.put(token, payload)
+    return payload
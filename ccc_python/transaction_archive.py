@@ -0,0 +1,226 @@
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from config import Config
+from log_utils import get_logger
+from transaction_batch import NO_CATEGORY, TransactionBatch
+from utils import user_folder_name
+
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow is optional
+    pa = None
+    ipc = None
+
+
+ARCHIVE_SCHEMA = None
+if pa is not None:
+    ARCHIVE_SCHEMA = pa.schema([
+        ('_id', pa.string()),
+        ('user_id', pa.dictionary(pa.int32(), pa.string())),
+        ('date', pa.timestamp('us')),
+        ('description', pa.string()),
+        ('prefix', pa.int8()),
+        ('amount', pa.float64()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('created_at', pa.timestamp('us'))
+    ])
+
+
+def archive_available() -> bool:
+    """Check whether the columnar archive is enabled and pyarrow is installed"""
+    return Config.ARCHIVE_ENABLED and pa is not None
+
+
+def _user_folder(user_id: str) -> str:
+    return os.path.join(Config.ARCHIVE_FOLDER, user_folder_name(user_id))
+
+
+def _document_tables(transactions: list, user_id: str):
+    """(month, table) pairs for a list of transaction documents"""
+    by_month = {}
+    for doc in transactions:
+        date = doc.get('date')
+        month = date.strftime('%Y-%m') if isinstance(date, datetime) else 'unknown'
+        by_month.setdefault(month, []).append(doc)
+
+    for month, docs in by_month.items():
+        yield month, pa.Table.from_pydict({
+            '_id': [str(d['_id']) if d.get('_id') is not None else None for d in docs],
+            'user_id': [user_id] * len(docs),
+            'date': [d.get('date') for d in docs],
+            'description': [d.get('description') for d in docs],
+            'prefix': [d.get('prefix') for d in docs],
+            'amount': [d.get('amount') for d in docs],
+            'category': [d.get('category') for d in docs],
+            'created_at': [d.get('created_at') for d in docs]
+        }, schema=ARCHIVE_SCHEMA)
+
+
+def _batch_tables(batch: TransactionBatch):
+    """(month, table) pairs built from a batch's arrays"""
+    rows = batch.rows
+    months = rows['date'].astype('datetime64[M]')
+    # The batch's category codes become the Arrow dictionary indices as-is
+    categories = pa.DictionaryArray.from_arrays(
+        pa.array(np.ascontiguousarray(rows['category']),
+                 mask=rows['category'] == NO_CATEGORY),
+        pa.array(batch.category_names, pa.string()))
+    table = pa.Table.from_pydict({
+        '_id': batch.ids,
+        'user_id': [batch.user_id] * len(batch),
+        'date': np.ascontiguousarray(rows['date']),
+        'description': batch.descriptions,
+        'prefix': np.ascontiguousarray(rows['prefix']),
+        'amount': np.ascontiguousarray(rows['amount']),
+        'category': categories,
+        'created_at': np.ascontiguousarray(rows['created_at'])
+    }, schema=ARCHIVE_SCHEMA)
+
+    for month in np.unique(months):
+        selected = np.isnat(months) if np.isnat(month) else months == month
+        name = 'unknown' if np.isnat(month) else str(month)
+        yield name, table.filter(pa.array(selected))
+
+
+def archive_transactions(transactions, user_id: str) -> list:
+    """Append saved transactions to the user's Arrow archive.
+
+    transactions is a list of saved documents or an inserted TransactionBatch.
+    Rows are partitioned into one folder per month (YYYY-MM) and each call
+    writes a new uncompressed Arrow IPC file, so readers can memory-map them
+    without a decode step. Returns the paths written.
+    """
+    if not archive_available() or not len(transactions):
+        return []
+
+    if isinstance(transactions, TransactionBatch):
+        tables = _batch_tables(transactions)
+    else:
+        tables = _document_tables(transactions, user_id)
+
+    written = []
+    batch_name = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.arrow"
+    for month, table in tables:
+        month_folder = os.path.join(_user_folder(user_id), month)
+        os.makedirs(month_folder, exist_ok=True)
+        path = os.path.join(month_folder, batch_name)
+        # Write to a temp file first so readers never see a partial file
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, ARCHIVE_SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        written.append(path)
+
+    return written
+
+
+def _archive_files(user_id: str, months: list = None) -> list:
+    user_folder = _user_folder(user_id)
+    if not os.path.isdir(user_folder):
+        return []
+    paths = []
+    for month in sorted(os.listdir(user_folder)):
+        if months is not None and month not in months:
+            continue
+        month_folder = os.path.join(user_folder, month)
+        paths.extend(os.path.join(month_folder, filename)
+                     for filename in sorted(os.listdir(month_folder))
+                     if filename.endswith('.arrow'))
+    return paths
+
+
+def archived_row_count(user_id: str) -> int:
+    """Number of rows archived for the user, read from the file footers"""
+    if pa is None:
+        raise RuntimeError('pyarrow is required to read the transaction archive')
+    total = 0
+    for path in _archive_files(user_id):
+        reader = ipc.open_file(pa.memory_map(path, 'r'))
+        total += sum(reader.get_batch(i).num_rows
+                     for i in range(reader.num_record_batches))
+    return total
+
+
+def load_archived_table(user_id: str, columns: list = None, months: list = None):
+    """Memory-map the user's archive files and return a single Arrow table.
+
+    Args:
+        user_id: owner of the transactions
+        columns: optional subset of columns to keep (column pruning)
+        months: optional list of 'YYYY-MM' partitions to read
+
+    Returns:
+        pyarrow.Table, or None when the user has no archived data
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow is required to read the transaction archive')
+
+    tables = []
+    for path in _archive_files(user_id, months):
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        tables.append(table)
+
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
+
+
+def load_archived_dataframe(user_id: str, columns: list = None, months: list = None):
+    """Load the user's archive as a pandas DataFrame.
+
+    Numeric and timestamp columns are converted without copying where Arrow
+    allows it; dictionary columns become pandas categoricals.
+    """
+    table = load_archived_table(user_id, columns=columns, months=months)
+    if table is None:
+        return None
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def backfill_archive(storage, user_ids: list = None) -> int:
+    """Rebuild archives from the storage backend for users whose history predates the archive"""
+    if pa is None:
+        raise RuntimeError('pyarrow is required to build the transaction archive')
+
+    if user_ids is None:
+        user_ids = storage.transaction_user_ids()
+
+    total = 0
+    for user_id in user_ids:
+        user_folder = _user_folder(user_id)
+        if os.path.isdir(user_folder):
+            # Replace rather than duplicate the existing archive
+            for month in os.listdir(user_folder):
+                month_folder = os.path.join(user_folder, month)
+                for filename in os.listdir(month_folder):
+                    os.remove(os.path.join(month_folder, filename))
+                os.rmdir(month_folder)
+
+        docs = storage.find_transactions(user_id)
+        archive_transactions(docs, user_id)
+        total += len(docs)
+        logger.info("Archived transactions", extra={'fields': {
+            'user_id': user_id, 'count': len(docs)}})
+
+    return total
+
+
+if __name__ == '__main__':
+    import sys
+    from log_utils import setup_logging
+    setup_logging()
+    from db import storage
+
+    Config.ARCHIVE_ENABLED = True
+    count = backfill_archive(storage, sys.argv[1:] or None)
+    print(f"Backfilled {count} transactions into {Config.ARCHIVE_FOLDER}/")
@@ -0,0 +1,263 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Fixed-width fields of one transaction, stored as a single structured array
+# (33 bytes per row). Descriptions are variable-length and kept in a list.
+TRANSACTION_DTYPE = np.dtype([
+    ('date', 'datetime64[us]'),
+    ('created_at', 'datetime64[us]'),
+    ('amount', 'f8'),
+    ('page_number', 'i4'),   # NO_PAGE when the row is not tied to a document page
+    ('prefix', 'i1'),
+    ('category', 'i4'),      # index into the batch's category_names, NO_CATEGORY for null
+])
+
+NO_PAGE = -1
+NO_CATEGORY = -1
+
+
+def _factorize_categories(names) -> tuple:
+    """(codes, distinct names) for a column of category names.
+
+    Codes are local to one batch, so the names the LLM makes up never
+    accumulate beyond the batch that holds them.
+    """
+    codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+    # factorize labels nulls -1, which is NO_CATEGORY
+    return codes.astype(np.int32), list(uniques)
+
+
+def _datetime64(value):
+    if isinstance(value, str):
+        # Dates stored as text in any format pandas recognises
+        value = pd.to_datetime(value, format='mixed', errors='coerce')
+    if value is None or pd.isna(value):
+        return np.datetime64('NaT', 'us')
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # numpy only stores naive values; keep the wall-clock time
+        value = value.replace(tzinfo=None)
+    try:
+        return np.datetime64(value, 'us')
+    except (ValueError, TypeError):
+        # Unparseable dates become NaT, which the feature engine drops
+        return np.datetime64('NaT', 'us')
+
+
+def _datetime_array(values) -> np.ndarray:
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'M':
+        return values.astype('datetime64[us]')
+    try:
+        # pandas parses a list of datetimes far faster than np.array does
+        index = pd.DatetimeIndex(values)
+    except (ValueError, TypeError):
+        return np.array([_datetime64(value) for value in values],
+                        dtype='datetime64[us]')
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit('us').to_numpy()
+
+
+def _int_array(values, dtype, missing: int) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=dtype)
+    except (ValueError, TypeError):
+        # Nulls (or NaN from a nullable database column)
+        return np.array([missing if value is None or value != value else value
+                         for value in values], dtype=dtype)
+
+
+class TransactionBatch:
+    """Column-oriented transactions for one user.
+
+    Parsed rows go straight into a structured NumPy array instead of one
+    dict per row, and are only expanded into documents at the MongoDB
+    boundary. The SQL writers, the Arrow archive and FinanceProcessor read
+    the columns directly.
+
+    Categories are stored as codes into the batch's own `category_names`.
+    `ids` is set once the batch has been inserted.
+    """
+
+    __slots__ = ('user_id', 'document_hash', 'rows', 'descriptions',
+                 'category_names', 'ids')
+
+    def __init__(self, user_id: str, rows: np.ndarray, descriptions: list,
+                 document_hash: str = None, ids: list = None,
+                 category_names: list = None):
+        if len(rows) != len(descriptions):
+            raise ValueError('rows and descriptions must have the same length')
+        self.user_id = user_id
+        self.document_hash = document_hash
+        self.rows = rows
+        self.descriptions = descriptions
+        self.category_names = category_names or []
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def empty(cls, user_id: str, document_hash: str = None) -> 'TransactionBatch':
+        return cls(user_id, np.empty(0, dtype=TRANSACTION_DTYPE), [], document_hash)
+
+    @classmethod
+    def from_columns(cls, user_id: str, columns: dict,
+                     document_hash: str = None) -> 'TransactionBatch':
+        """Build a batch from {field: sequence} columns.
+
+        Each column is converted in one call; missing optional columns are
+        filled with NaT, NO_PAGE or None descriptions.
+        """
+        count = len(columns['date'])
+        rows = np.empty(count, dtype=TRANSACTION_DTYPE)
+        rows['date'] = _datetime_array(columns['date'])
+        rows['amount'] = np.asarray(columns['amount'], dtype=np.float64)
+        rows['prefix'] = _int_array(columns['prefix'], np.int8, 0)
+        rows['category'], category_names = _factorize_categories(columns['category'])
+        created_at = columns.get('created_at')
+        rows['created_at'] = (np.datetime64('NaT', 'us') if created_at is None
+                              else _datetime_array(created_at))
+        page_numbers = columns.get('page_number')
+        rows['page_number'] = (NO_PAGE if page_numbers is None
+                               else _int_array(page_numbers, np.int32, NO_PAGE))
+        descriptions = columns.get('description')
+        descriptions = [None] * count if descriptions is None else list(descriptions)
+        return cls(user_id, rows, descriptions, document_hash,
+                   category_names=category_names)
+
+    @classmethod
+    def from_transactions(cls, transactions: list, user_id: str,
+                          document_hash: str = None,
+                          page_number: int = None) -> 'TransactionBatch':
+        """Build a batch from parsed Transaction models (one LLM chunk).
+
+        created_at stays NaT; storage stamps it when the rows are written.
+        """
+        batch = cls.from_columns(user_id, {
+            'date': [t.date for t in transactions],
+            'amount': [t.amount for t in transactions],
+            'prefix': [t.prefix for t in transactions],
+            'category': [t.category for t in transactions],
+            'description': [t.description for t in transactions],
+        }, document_hash)
+        if page_number is not None:
+            batch.rows['page_number'] = page_number
+        return batch
+
+    @classmethod
+    def from_documents(cls, documents, user_id: str,
+                       chunk_size: int = 10000) -> 'TransactionBatch':
+        """Build a batch from stored documents, e.g. a MongoDB cursor.
+
+        Documents are converted chunk_size at a time, so only one chunk of
+        them is ever held as Python objects.
+        """
+        fields = ['date', 'amount', 'prefix', 'category', 'description',
+                  'created_at', 'page_number']
+        batches, chunk = [], []
+
+        def flush():
+            batches.append(cls.from_columns(user_id, {
+                field: [document.get(field) for document in chunk]
+                for field in fields}))
+            chunk.clear()
+
+        for document in documents:
+            chunk.append(document)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk or not batches:
+            flush()
+        return cls.concat(batches)
+
+    @classmethod
+    def concat(cls, batches: list) -> 'TransactionBatch':
+        """Join batches of the same user and document into one.
+
+        Category codes are remapped onto the union of the batches' names.
+        """
+        first = batches[0]
+        if len(batches) == 1:
+            return first
+        descriptions, category_names, positions, codes = [], [], {}, []
+        for batch in batches:
+            descriptions.extend(batch.descriptions)
+            for name in batch.category_names:
+                if name not in positions:
+                    positions[name] = len(category_names)
+                    category_names.append(name)
+            # The trailing NO_CATEGORY maps the -1 codes to themselves
+            mapping = np.array([positions[name] for name in batch.category_names]
+                               + [NO_CATEGORY], dtype=np.int32)
+            codes.append(mapping[batch.rows['category']])
+        rows = np.concatenate([batch.rows for batch in batches])
+        rows['category'] = np.concatenate(codes)
+        return cls(first.user_id, rows, descriptions, first.document_hash,
+                   category_names=category_names)
+
+    def stamp_created_at(self, created_at: datetime = None):
+        """Set every row's created_at, by default to now.
+
+        Storage backends call this as the rows are written, so created_at
+        is the save time that feature freshness checks compare against.
+        """
+        self.rows['created_at'] = _datetime64(created_at or datetime.now())
+
+    def categories(self) -> np.ndarray:
+        """Object array of category names (None for NO_CATEGORY)"""
+        names = np.array(self.category_names + [None], dtype=object)
+        return names[self.rows['category']]
+
+    def page_numbers(self) -> list:
+        pages = self.rows['page_number'].tolist()
+        return [None if page == NO_PAGE else page for page in pages]
+
+    def columns(self) -> dict:
+        """Python-valued columns keyed by document field, for drivers that need them.
+
+        Each column is converted with a single tolist(); NaT becomes None.
+        """
+        rows = self.rows
+        columns = {
+            'user_id': [self.user_id] * len(self),
+            'date': rows['date'].tolist(),
+            'description': self.descriptions,
+            'prefix': rows['prefix'].tolist(),
+            'amount': rows['amount'].tolist(),
+            'category': self.categories().tolist(),
+            'created_at': rows['created_at'].tolist(),
+        }
+        if self.document_hash is not None:
+            columns['document_hash'] = [self.document_hash] * len(self)
+            columns['page_number'] = self.page_numbers()
+        return columns
+
+    def to_documents(self) -> list:
+        """MongoDB documents, shaped like the ones the parser used to build"""
+        columns = self.columns()
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+    def to_frame(self, columns: list = None) -> pd.DataFrame:
+        """DataFrame of the batch's columns; category is a pandas categorical.
+
+        Fixed-width columns are copied out of the structured array as whole
+        arrays (consumers such as DuckDB need them contiguous), so no per-row
+        objects are created for them.
+        """
+        rows = self.rows
+        builders = {
+            'date': lambda: np.ascontiguousarray(rows['date']),
+            'amount': lambda: np.ascontiguousarray(rows['amount']),
+            'prefix': lambda: np.ascontiguousarray(rows['prefix']),
+            'category': lambda: pd.Categorical.from_codes(
+                rows['category'], categories=self.category_names),
+            'created_at': lambda: np.ascontiguousarray(rows['created_at']),
+            'description': lambda: self.descriptions,
+            'page_number': lambda: np.ascontiguousarray(rows['page_number']),
+        }
+        columns = columns or list(builders)
+        return pd.DataFrame({column: builders[column]() for column in columns},
+                            copy=False)
@@ -1,11 +1,19 @@
 import openai
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 from config import Config
 import os
 import json
-from datetime import datetime
-from db import transactions_collection
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from db import storage
+from admission import AdmissionController, Reservation, admission_controller
+from transaction_archive import archive_available, archive_transactions
+from transaction_batch import TransactionBatch
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 
 # Initialize OpenAI client
@@ -25,54 +33,138 @@ class TransactionList(BaseModel):
     Transactions: List[Transaction]
 
 
+# Maximum chunk size (in characters) sent to the LLM
+MAX_CHUNK_SIZE = 2300
+
+
+def iter_transaction_chunks(transaction_text: str):
+    """Yield LLM-sized chunks of page text, split at newline boundaries"""
+    # Remove first line (Page #)
+    transaction_texts = transaction_text.split('\n')[1:]
+    first_line = transaction_texts[0]
+    # If text is shorter than max size, process it directly
+    if len(transaction_text) <= MAX_CHUNK_SIZE:
+        yield transaction_text
+        return
+
+    current_chunk = ""
+    for line in transaction_texts:
+        if len(current_chunk) + len(line) + 1 <= MAX_CHUNK_SIZE:
+            current_chunk += line + '\n'
+        else:
+            if current_chunk:
+                yield current_chunk
+            current_chunk = first_line + '\n'+line + '\n'
+
+    # Add the last chunk if it exists
+    if current_chunk:
+        yield first_line+'\n'+current_chunk
+
+
+class DocumentBusy(Exception):
+    """Raised when another run is processing, or has taken over, a document"""
+
+
+class DocumentLease:
+    """One run's claim on a document while it is 'processing'.
+
+    The claim lapses when the document is not updated for
+    DOCUMENT_LEASE_SECONDS, so the run renews it as it makes progress and
+    before every page commit.
+    """
+
+    def __init__(self, user_id: str, document_hash: str):
+        self.user_id = user_id
+        self.document_hash = document_hash
+        self.token = uuid.uuid4().hex
+
+    def claim(self):
+        stale_before = datetime.now() - timedelta(
+            seconds=Config.DOCUMENT_LEASE_SECONDS)
+        if not storage.claim_document(self.user_id, self.document_hash,
+                                      self.token, stale_before):
+            raise DocumentBusy('Document is already being processed; try again later')
+
+    def renew(self):
+        """Extend the claim, or raise DocumentBusy if it was lost"""
+        if not storage.renew_document_lease(self.user_id, self.document_hash,
+                                            self.token):
+            raise DocumentBusy('Another run took over this document')
+
+
+class ChunkCheckpoints:
+    """Parsed chunk results for one document page, saved as each completes.
+
+    A chunk is reused only if its text hash matches, so changed boxes or
+    chunking never replay stale LLM output. With a lease, every save also
+    renews it, so a page with many chunks keeps the document claimed.
+    """
+
+    def __init__(self, user_id: str, document_hash: str, page_number: int,
+                 lease: DocumentLease = None):
+        self.key = (user_id, document_hash, page_number)
+        self.lease = lease
+        self._saved = storage.find_chunk_checkpoints(*self.key)
+
+    @staticmethod
+    def _chunk_hash(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+
+    def load(self, index: int, chunk: str):
+        saved = self._saved.get(index)
+        if saved is None or saved['chunk_hash'] != self._chunk_hash(chunk):
+            return None
+        return TransactionList.model_validate(saved['result'])
+
+    def save(self, index: int, chunk: str, result: TransactionList):
+        if self.lease is not None:
+            self.lease.renew()
+        storage.save_chunk_checkpoint(*self.key, index, self._chunk_hash(chunk),
+                                      result.model_dump(mode='json'))
+
+
+def iter_parsed_chunks(transaction_text: str, user_id: str,
+                       checkpoints: ChunkCheckpoints = None,
+                       admission: Union[AdmissionController, Reservation] = None):
+    """Parse page text chunk by chunk, yielding one TransactionList per chunk.
+
+    With checkpoints, chunks parsed by an earlier attempt are reused and new
+    results are saved before being yielded. LLM calls hold a slot of
+    `admission`, the shared admission_controller by default.
+    """
+    admission = admission or admission_controller
+    for index, chunk in enumerate(iter_transaction_chunks(transaction_text)):
+        if checkpoints is not None:
+            saved = checkpoints.load(index, chunk)
+            if saved is not None:
+                logger.debug("Reusing checkpointed chunk",
+                             extra={'fields': {'chunk_index': index}})
+                yield saved
+                continue
+
+        # Log sizes only; chunk text is customer statement data
+        logger.debug("Processing transaction chunk",
+                     extra={'fields': {'chunk_chars': len(chunk)}})
+        with admission.slot(user_id):
+            result = _process_single_chunk(chunk)
+        if checkpoints is not None:
+            checkpoints.save(index, chunk, result)
+        yield result
+
+
 def process_transaction_text(transaction_text: str, user_id: str) -> TransactionList:
     """Process transaction text using OpenAI API and return structured data"""
 
     try:
-        # Remove first line (Page #)
-        transaction_texts = transaction_text.split('\n')[1:]
-        # Define maximum chunk size (in characters)
-        MAX_CHUNK_SIZE = 2300
-        first_line = transaction_texts[0]
-        # If text is shorter than max size, process it directly
-        if len(transaction_text) <= MAX_CHUNK_SIZE:
-            tmp = _process_single_chunk(transaction_text)
-            return save_transactions(tmp, user_id)
-
-        # Split text into chunks at newline boundaries
-        chunks = []
-        current_chunk = ""
-
-        for line in transaction_texts:
-            if len(current_chunk) + len(line) + 1 <= MAX_CHUNK_SIZE:
-                current_chunk += line + '\n'
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = first_line + '\n'+line + '\n'
-
-        # Add the last chunk if it exists
-        if current_chunk:
-            chunks.append(first_line+'\n'+current_chunk)
-
-        # Process each chunk and combine results
+        # Process each chunk, saving as we go, and combine results
         all_transactions = []
-        for chunk in chunks:
-            print("this chunk is processing: ", chunk)
-            chunk_result = _process_single_chunk(chunk)
+        for chunk_result in iter_parsed_chunks(transaction_text, user_id):
             save_transactions(chunk_result, user_id)
             all_transactions.extend(chunk_result.Transactions)
 
-        # Create combined TransactionList
-        combined_transactions = TransactionList(
-            Transactions=all_transactions)
-
-        # Save all transactions
-        # save_transactions(combined_transactions, user_id)
-
-        return combined_transactions
+        return TransactionList(Transactions=all_transactions)
     except Exception as e:
-        print(f"Error processing transactions: {str(e)}")
+        logger.error(f"Error processing transactions: {str(e)}")
         raise e
 
 
@@ -130,34 +222,66 @@ def _process_single_chunk(transaction_text: str) -> TransactionList:
         response = completion.choices[0].message
         return response.parsed
     except Exception as e:
-        print(f"Error processing transactions: {str(e)}")
+        logger.error(f"Error processing transactions: {str(e)}")
         raise e
 
 
 def save_transactions(transactions: TransactionList, user_id: str):
-    """Save individual transactions to MongoDB"""
+    """Save individual transactions to the storage backend"""
+    return save_transaction_batch(
+        TransactionBatch.from_transactions(transactions.Transactions, user_id))
+
+
+def _mirror_to_archive(batch: TransactionBatch):
+    # Mirror the saved rows into the columnar archive; the storage backend
+    # stays the source of truth, so archive failures must not fail ingestion
+    if len(batch) and archive_available():
+        try:
+            archive_transactions(batch, batch.user_id)
+        except Exception as archive_error:
+            logger.warning(
+                f"Error archiving transactions: {str(archive_error)}")
+
+
+def save_transaction_batch(batch: TransactionBatch) -> list:
+    """Insert a batch of parsed transactions with a single bulk write"""
+    if not len(batch):
+        return []
 
     try:
-        saved_ids = []
-        for transaction in transactions.Transactions:
-            # Convert transaction to dictionary and add timestamp
-            transaction_dict = transaction.model_dump()
-            transaction_dict['created_at'] = datetime.now()
-            transaction_dict['user_id'] = user_id
-
-            # Insert into MongoDB
-            result = transactions_collection.insert_one(transaction_dict)
-
-            if result.inserted_id:
-                saved_ids.append(str(result.inserted_id))
-                print(f"""Transaction successfully saved to MongoDB with ID: {
-                      result.inserted_id}""")
-            else:
-                raise Exception("Failed to save transaction to MongoDB")
+        saved_ids = storage.insert_transaction_batch(batch)
+        _mirror_to_archive(batch)
 
+        logger.info("Saved transactions", extra={'fields': {
+            'user_id': batch.user_id, 'count': len(saved_ids)}})
         return saved_ids
 
     except Exception as e:
         error_msg = f"Error saving transactions: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+
+def save_page_transactions(batch: TransactionBatch, page_number: int) -> tuple:
+    """Replace the rows previously extracted from one document page.
+
+    The batch carries the user and document hash. The page's chunk
+    checkpoints are dropped once its rows are committed.
+    Returns (saved IDs, number of stale rows deleted).
+    """
+    user_id, document_hash = batch.user_id, batch.document_hash
+    try:
+        saved_ids, deleted = storage.replace_page_transactions(
+            user_id, document_hash, page_number, batch)
+        storage.clear_chunk_checkpoints(user_id, document_hash, page_number)
+        _mirror_to_archive(batch)
+
+        logger.info("Replaced page transactions", extra={'fields': {
+            'user_id': user_id, 'page': page_number,
+            'count': len(saved_ids), 'deleted': deleted}})
+        return saved_ids, deleted
+
+    except Exception as e:
+        error_msg = f"Error saving transactions: {str(e)}"
+        logger.error(error_msg)
         raise Exception(error_msg)
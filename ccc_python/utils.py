@@ -1,9 +1,13 @@
 from werkzeug.utils import secure_filename
 from PyPDF2 import PdfReader
 import json
+import logging
 import os
 
 from config import Config
+from log_utils import get_logger, sampled
+
+logger = get_logger(__name__)
 
 
 def allowed_file(filename):
@@ -11,6 +15,23 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 
+def user_folder_name(user_id) -> str:
+    """Folder name for a client-supplied user ID.
+
+    ASCII letters, digits, '-' and '_' are kept; every other character
+    (including '%', '.' and '/') becomes %XX escapes of its UTF-8 bytes.
+    Distinct IDs therefore never share a folder and none can leave the
+    parent directory.
+    """
+    user_id = str(user_id)
+    if not user_id:
+        raise ValueError('Invalid user ID')
+    return ''.join(
+        c if (c.isascii() and c.isalnum()) or c in '-_'
+        else ''.join(f'%{byte:02X}' for byte in c.encode('utf-8'))
+        for c in user_id)
+
+
 def save_pdf_file(file):
     """Save the uploaded PDF file and return the filepath"""
     filename = secure_filename(file.filename)
@@ -23,15 +44,17 @@ def process_boxes_data(boxes_data, filepath):
     """Process and transform the boxes data according to PDF dimensions"""
     try:
         boxes = json.loads(boxes_data)
-        print("Input boxes:", boxes)
+        logger.debug("Input boxes received",
+                     extra={'fields': {'pages': len(boxes)}})
 
         pdf_reader = PdfReader(filepath)
 
         for page_num in boxes.keys():
             # nga loe ma AI nk -1
             pdf_height = float(pdf_reader.pages[int(page_num)-1].mediabox[3])
-            print(pdf_reader.pages[int(page_num)-1])
-            print(f"Processing page {page_num}, PDF height: {pdf_height}")
+            logger.debug("Processing boxes for page", extra={'fields': {
+                'page': page_num, 'pdf_height': pdf_height,
+                'boxes': len(boxes[page_num])}})
             for box in boxes[page_num]:
                 # Convert coordinates with decimal precision
                 x = float(box['x'])
@@ -48,7 +71,9 @@ def process_boxes_data(boxes_data, filepath):
                 # Format coordinates as string
                 coord_str = f"{x1},{y1},{x2},{y2}"
                 boxes[page_num][boxes[page_num].index(box)] = coord_str
-                print(f"Transformed box: {coord_str}")
+                if logger.isEnabledFor(logging.DEBUG) and sampled('process_boxes_data'):
+                    logger.debug("Transformed box",
+                                 extra={'fields': {'page': page_num, 'box': coord_str}})
 
         return boxes
     except json.JSONDecodeError:
@@ -83,4 +108,4 @@ def cleanup_uploads_folder(filepath):
             try:
                 os.remove(file_path)
             except Exception as e:
-                print(f"Error removing file {file_path}: {str(e)}")
+                logger.warning(f"Error removing file {file_path}: {str(e)}")